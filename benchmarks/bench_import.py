@@ -0,0 +1,48 @@
+"""Benchmark the import time of `imcflibs` with lazily loaded submodules.
+
+Every scenario is run in a fresh interpreter (the one running this script), the
+reported time only covers the import statements, not the interpreter startup.
+Run from the repository root, e.g. `python benchmarks/bench_import.py` (works
+with C-Python and Jython, `imcflibs` has to be importable). Outside of Fiji the
+`imagej` scenario requires `imcf-fiji-mocks` to be installed.
+"""
+
+import subprocess
+import sys
+
+SCENARIOS = [
+    ("import imcflibs", "import imcflibs"),
+    ("pathtools only", "import imcflibs.pathtools"),
+    ("bioformats only", "from imcflibs.imagej import bioformats"),
+    (
+        "former eager imports",
+        "import imcflibs.iotools, imcflibs.log, imcflibs.pathtools, "
+        "imcflibs.strtools; "
+        "from imcflibs.imagej import bioformats, misc, prefs, projections, "
+        "shading, sjlog, split, stitching",
+    ),
+]
+
+TEMPLATE = "import time; _t = time.time(); %s; print(time.time() - _t)"
+
+
+def time_import(statement):
+    """Run an import statement in a new interpreter and return its duration."""
+    output = subprocess.check_output([sys.executable, "-c", TEMPLATE % statement])
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def main(repeat=5):
+    """Run the benchmark and print the timings (best of `repeat` runs)."""
+    print("import times (best of %s fresh interpreters):" % repeat)
+    for label, statement in SCENARIOS:
+        try:
+            best = min(time_import(statement) for _ in range(repeat))
+        except subprocess.CalledProcessError:
+            print("  %-22s failed (not running in Fiji / mocks missing?)" % label)
+            continue
+        print("  %-22s %7.1fms" % (label, best * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark natural sorting against the previous implementation.
+
+Run from the repository root, e.g. `python benchmarks/bench_natural_sort.py`
+(works with C-Python and Jython, `imcflibs` has to be importable).
+"""
+
+import random
+import re
+import timeit
+
+from imcflibs.strtools import NaturalSortedList, sort_alphanumerically
+
+
+def sort_alphanumerically_legacy(data):
+    """Sort using the implementation of `sort_alphanumerically()` up to 1.5.0."""
+
+    def convert(text):
+        return int(text) if text.isdigit() else text.lower()
+
+    def alphanum_key(key):
+        return [convert(c) for c in re.split("([0-9]+)", key)]
+
+    return sorted(data, key=alphanum_key)
+
+
+def tile_names(count):
+    """Generate a shuffled list of tile-like file names."""
+    names = [
+        "Plate_%s_Well-%s_Tile-%s_z%s.ome.tif" % (i % 3, i % 96, i, i % 7)
+        for i in range(count)
+    ]
+    random.seed(42)
+    random.shuffle(names)
+    return names
+
+
+def main(count=100000, repeat=3):
+    """Run the benchmark and print the timings."""
+    names = tile_names(count)
+    assert sort_alphanumerically(names) == sort_alphanumerically_legacy(names)
+
+    def best_of(func):
+        return min(timeit.repeat(func, number=1, repeat=repeat))
+
+    legacy = best_of(lambda: sort_alphanumerically_legacy(names))
+    current = best_of(lambda: sort_alphanumerically(names))
+    print("sorting %s names:" % count)
+    print("  legacy implementation:   %.3fs" % legacy)
+    print("  sort_alphanumerically(): %.3fs (%.2fx)" % (current, legacy / current))
+
+    # simulate a hot folder: files arriving one by one into a sorted list
+    arrivals = names[:200]
+    base = names[200:20200]
+
+    def resort():
+        data = list(base)
+        for name in arrivals:
+            data.append(name)
+            data = sort_alphanumerically(data)
+
+    def insert():
+        data = NaturalSortedList(base)
+        data.update(arrivals)
+
+    print("adding %s names one by one to %s ones:" % (len(arrivals), len(base)))
+    print("  re-sorting after each:   %.3fs" % best_of(resort))
+    print("  NaturalSortedList.add(): %.3fs" % best_of(insert))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""Benchmark suite for the pure-Python helpers of `imcflibs`.
+
+Synthetic data (directory trees, name lists, text files) is generated in a
+temporary directory, the timings are printed and can be saved as JSON to be
+compared against a previous run, e.g. the last release:
+
+    python benchmarks/suite.py --output baseline.json
+    python benchmarks/suite.py --compare baseline.json
+
+The `--compare` run exits with status 1 if any benchmark got slower than the
+given threshold. Run from the repository root (works with C-Python and Jython,
+`imcflibs` has to be importable). Outside of Fiji the `ProcessingOptions`
+benchmark requires `imcf-fiji-mocks` to be installed, otherwise it is skipped.
+Benchmarks of functions (or parameters) not available in the imported version
+of `imcflibs` are skipped as well, so the suite can also be run on older
+releases to create a baseline.
+"""
+
+import argparse
+import gzip
+import inspect
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+from imcflibs import iotools, pathtools, strtools
+
+# version of the JSON results format:
+FORMAT = 1
+
+# number of files in the directory tree, names in the lists and text lines:
+SCALES = {
+    "small": {"files": 10000, "names": 100000, "lines": 200000},
+    "medium": {"files": 100000, "names": 300000, "lines": 1000000},
+    "large": {"files": 1000000, "names": 1000000, "lines": 5000000},
+}
+
+SUFFIXES = [".ome.tif", ".czi", ".txt", ".ics"]
+
+
+def accepts(func, name):
+    """Check if a function has a parameter with the given name."""
+    try:
+        params = inspect.signature(func).parameters
+    except AttributeError:  # Python 2.7 / Jython
+        params = inspect.getargspec(func).args
+    return name in params
+
+
+def clear_parse_cache():
+    """Clear the cache of `parse_path()`, if the imported version has one."""
+    cache = getattr(pathtools, "_PARSE_CACHE", None)
+    if cache is not None:
+        cache.clear()
+
+
+def make_names(count):
+    """Generate a shuffled list of tile-like file names."""
+    names = [
+        "Plate_%s_Well-%s_Tile-%s_z%s%s" % (i % 3, i % 96, i, i % 7, SUFFIXES[i % 4])
+        for i in range(count)
+    ]
+    random.seed(42)
+    random.shuffle(names)
+    return names
+
+
+def make_tree(root, count, per_dir=100):
+    """Create a directory tree with `count` (small) files, `per_dir` per folder.
+
+    The files are spread over a "plate / well" hierarchy, only every second
+    well contains `.czi` files to give `find_dirs_containing_filetype()` some
+    work to do.
+    """
+    for i in range(0, count, per_dir):
+        folder = os.path.join(root, "plate_%s" % (i // 10000), "well_%s" % i)
+        os.makedirs(folder)
+        suffix = ".czi" if (i // per_dir) % 2 else ".tif"
+        for j in range(min(per_dir, count - i)):
+            with open(os.path.join(folder, "tile_%s%s" % (j, suffix)), "w") as out:
+                out.write("x" * (j % 16))
+
+
+def make_flat_dir(root, count):
+    """Create a single directory with `count` empty files."""
+    folder = os.path.join(root, "flat")
+    os.makedirs(folder)
+    for name in make_names(count):
+        open(os.path.join(folder, name), "w").close()
+    return folder
+
+
+def make_textfile(root, count, compress=False):
+    """Create a text file with `count` lines, optionally gzip-compressed."""
+    fname = os.path.join(root, "lines.txt" + (".gz" if compress else ""))
+    line = "Tile_%08d;1024;1024;0.0;0.0;0.0\n"
+    if compress:
+        with gzip.open(fname, "wb") as out:
+            for i in range(count):
+                out.write((line % i).encode())
+    else:
+        with open(fname, "w") as out:
+            for i in range(count):
+                out.write(line % i)
+    return fname
+
+
+def format_processing_options(count):
+    """Create a function calling all `ProcessingOptions` formatters `count` times.
+
+    Returns None if `imcflibs.imagej.bdv` can't be imported.
+    """
+    try:
+        from imcflibs.imagej.bdv import ProcessingOptions
+    except ImportError:
+        return None
+
+    def run():
+        for i in range(count):
+            opts = ProcessingOptions()
+            opts.reference_channel(i % 3)
+            opts.process_timepoint(i % 5, range_end=i % 5 + 2)
+            opts.treat_tiles("group")
+            opts.fmt_acitt_options()
+            opts.fmt_acitt_selectors()
+            opts.fmt_how_to_treat()
+            opts.fmt_use_acitt()
+
+    return run
+
+
+def define_benchmarks(root, scale):
+    """Generate the test data and define the benchmarks.
+
+    Returns
+    -------
+    list(tuple)
+        Tuples of the benchmark name, the number of items it is processing and
+        the function to be timed.
+    """
+    sizes = SCALES[scale]
+    print("generating test data in [%s]..." % root)
+    start = time.time()
+    tree = os.path.join(root, "tree")
+    make_tree(tree, sizes["files"])
+    flat = make_flat_dir(root, sizes["files"] // 10)
+    textfile = make_textfile(root, sizes["lines"])
+    gzfile = make_textfile(root, sizes["lines"], compress=True)
+    names = make_names(sizes["names"])
+    paths = ["/data/%s/%s" % (i % 100, x) for i, x in enumerate(names)]
+    print("done (%.1fs)" % (time.time() - start))
+
+    # a cache miss for every path (e.g. a file list longer than the cache):
+    def parse_path_cold():
+        clear_parse_cache()
+        for path in paths:
+            parsed = pathtools.parse_path(path)
+            parsed["basename"], parsed["path"]
+
+    # repeated lookups of a working set fitting into the cache:
+    working_set = paths[:1000] * (len(paths) // 1000)
+
+    def parse_path_warm():
+        for path in working_set:
+            parsed = pathtools.parse_path(path)
+            parsed["basename"], parsed["path"]
+
+    def parse_paths():
+        clear_parse_cache()
+        pathtools.parse_paths(paths)
+
+    n_flat = sizes["files"] // 10
+    n_dirs = sizes["files"] // 100
+    benchmarks = [
+        ("parse_path (uncached)", len(paths), parse_path_cold),
+        ("parse_path (cached)", len(working_set), parse_path_warm),
+        (
+            "listdir_matching",
+            n_flat,
+            lambda: pathtools.listdir_matching(flat, ".czi", fullpath=True),
+        ),
+        (
+            "listdir_matching (regex, sorted)",
+            n_flat,
+            lambda: pathtools.listdir_matching(
+                flat, r".*_z[0-3]\.czi$", regex=True, sort=True
+            ),
+        ),
+        (
+            "find_dirs_containing_filetype",
+            n_dirs,
+            lambda: pathtools.find_dirs_containing_filetype(tree, ".czi"),
+        ),
+        ("folder_size", sizes["files"], lambda: pathtools.folder_size(tree)),
+        (
+            "sort_alphanumerically",
+            len(names),
+            lambda: strtools.sort_alphanumerically(names),
+        ),
+        ("readtxt", sizes["lines"], lambda: iotools.readtxt(textfile)),
+        (
+            "readtxt (flat)",
+            sizes["lines"],
+            lambda: iotools.readtxt(textfile, flat=True),
+        ),
+    ]
+    # benchmarks of functionality not available in older releases:
+    if hasattr(pathtools, "parse_paths"):
+        benchmarks.append(("parse_paths", len(paths), parse_paths))
+    if accepts(pathtools.folder_size, "threads"):
+        benchmarks.append(
+            (
+                "folder_size (4 threads)",
+                sizes["files"],
+                lambda: pathtools.folder_size(tree, threads=4),
+            )
+        )
+    if hasattr(iotools, "iter_lines"):  # compressed files are supported
+        benchmarks.append(
+            ("readtxt (gzip)", sizes["lines"], lambda: iotools.readtxt(gzfile))
+        )
+    formatters = format_processing_options(10000)
+    if formatters is not None:
+        benchmarks.append(("ProcessingOptions formatters", 10000, formatters))
+    else:
+        print("imcflibs.imagej.bdv not importable, skipping ProcessingOptions")
+    return benchmarks
+
+
+def run_benchmarks(benchmarks, repeat, only=None):
+    """Time the benchmarks and print the results.
+
+    Returns
+    -------
+    dict
+        The timings (best and median of all repetitions, in seconds) by name.
+    """
+    results = {}
+    for name, size, func in benchmarks:
+        if only and only not in name:
+            continue
+        timings = sorted(timeit.repeat(func, number=1, repeat=repeat))
+        results[name] = {
+            "size": size,
+            "repeat": repeat,
+            "best": timings[0],
+            "median": timings[len(timings) // 2],
+        }
+        print("  %-35s %9s items %9.4fs" % (name, size, timings[0]))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Compare results against a baseline, print and return the regressions."""
+    regressions = []
+    print("comparison against baseline (best times, current / baseline):")
+    for name, current in sorted(results.items()):
+        previous = baseline["results"].get(name)
+        if previous is None or previous["size"] != current["size"]:
+            print("  %-35s  not comparable" % name)
+            continue
+        ratio = current["best"] / previous["best"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  <-- REGRESSION"
+            regressions.append(name)
+        print("  %-35s %6.2fx%s" % (name, ratio, flag))
+    return regressions
+
+
+def main():
+    """Parse the command line arguments and run the suite."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", help="only run benchmarks containing this")
+    parser.add_argument("--output", help="JSON file to store the results")
+    parser.add_argument("--compare", help="JSON file with baseline results")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="slow-down factor to be reported as regression (default: 1.2)",
+    )
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="imcflibs-bench-")
+    try:
+        benchmarks = define_benchmarks(root, args.scale)
+        print("running benchmarks (best of %s):" % args.repeat)
+        results = run_benchmarks(benchmarks, args.repeat, args.only)
+    finally:
+        shutil.rmtree(root)
+
+    report = {
+        "format": FORMAT,
+        "meta": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(report, out, indent=2, sort_keys=True)
+        print("results saved to [%s]" % args.output)
+
+    if args.compare:
+        with open(args.compare) as infile:
+            baseline = json.load(infile)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
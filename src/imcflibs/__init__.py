@@ -9,14 +9,8 @@
 
 __version__ = "${project.version}"
 
-from . import iotools
-from . import log
-from . import pathtools
-from . import strtools
+# submodules are only imported when being accessed (e.g. `imcflibs.pathtools`),
+# note that `imagej` will only work when running in Jython within Fiji:
+from ._lazy import lazy_submodules as _lazy_submodules
 
-# check if we're running in Jython, then also import the 'imagej' submodule:
-import platform as _python_platform
-
-if _python_platform.python_implementation() == "Jython":  # pragma: no cover
-    from . import imagej
-del _python_platform
+_lazy_submodules(__name__, ["imagej", "iotools", "log", "pathtools", "strtools"])
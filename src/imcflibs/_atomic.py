@@ -0,0 +1,64 @@
+"""Atomic file writes working in Jython 2.7 and C-Python.
+
+The JSON sidecar files (caches, manifests, indexes) are re-written many times
+while processing a dataset. Writing them in place leaves a truncated file behind
+if the process gets interrupted (e.g. when Fiji is closed during a batch run),
+so they are written to a temporary file next to the target which is then renamed
+over it.
+"""
+
+import json
+import os
+import threading
+
+
+def replace_file(source, target):
+    """Rename a file, replacing the target if it exists.
+
+    `os.rename` is atomic on POSIX systems but refuses to overwrite an existing
+    file on Windows (and `os.replace` is lacking in Python 2.7 / Jython 2.7),
+    so in that case the target is removed first.
+
+    Parameters
+    ----------
+    source : str
+        The file to rename.
+    target : str
+        The new name of the file.
+    """
+    try:
+        os.rename(source, target)
+    except OSError:
+        if not os.path.exists(target):
+            raise
+        os.remove(target)
+        os.rename(source, target)
+
+
+def dump_json(data, path, **kwargs):
+    """Write data as JSON to a file, replacing it in a single step.
+
+    Parameters
+    ----------
+    data : object
+        The JSON-serializable data to write.
+    path : str
+        The file to write.
+    **kwargs
+        Passed on to `json.dump()`.
+
+    Raises
+    ------
+    IOError, OSError
+        If writing the temporary file or renaming it fails, the temporary file
+        is removed and `path` is left untouched.
+    """
+    tmp = "%s.%d-%d.tmp" % (path, os.getpid(), threading.current_thread().ident)
+    try:
+        with open(tmp, "w") as fh:
+            json.dump(data, fh, **kwargs)
+        replace_file(tmp, path)
+    except (IOError, OSError, TypeError, ValueError):
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
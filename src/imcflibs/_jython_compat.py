@@ -14,3 +14,9 @@ try:
 except NameError:
     # Python 3: "file" fully replaced with IOBase
     file_types = (io.IOBase,)
+
+# the module has been renamed from "Queue" in Python 3:
+try:
+    import queue
+except ImportError:  # Python 2.7 / Jython 2.7
+    import Queue as queue
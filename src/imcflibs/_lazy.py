@@ -0,0 +1,78 @@
+"""Lazy loading of submodules, working in Jython 2.7 and C-Python.
+
+Python 3.7+ would allow to implement this with a module-level `__getattr__()`
+(PEP 562), which is not available in Python 2.7 / Jython 2.7. Instead, the
+package replaces its entry in `sys.modules` by a `LazyModule` instance that
+imports a submodule when it is accessed as an attribute for the first time.
+
+In Jython the `import` statement may bind the original module object instead of
+the one replacing it in `sys.modules`, so the submodules are imported eagerly
+there (as it was done before lazy loading had been introduced).
+"""
+
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Module object importing the given submodules on first attribute access.
+
+    Parameters
+    ----------
+    module : module
+        The package module to wrap, its attributes are copied over.
+    submodules : list(str)
+        The names of the submodules to be loaded lazily.
+    """
+
+    def __init__(self, module, submodules):
+        types.ModuleType.__init__(self, module.__name__, module.__doc__)
+        self.__dict__.update(module.__dict__)
+        # keep a reference to the original module, otherwise Python 2 would
+        # reset its globals (used by any function defined there) to None once
+        # the module object gets garbage collected:
+        self.__dict__["_lazy_orig_module"] = module
+        self.__dict__["_lazy_submodules"] = frozenset(submodules)
+
+    def __getattr__(self, name):
+        """Import a lazy submodule (only called if `name` isn't set yet)."""
+        if name not in self._lazy_submodules:
+            raise AttributeError(
+                "module '%s' has no attribute '%s'" % (self.__name__, name)
+            )
+        submodule = importlib.import_module("%s.%s" % (self.__name__, name))
+        # the import machinery sets the attribute already, just to be sure:
+        self.__dict__[name] = submodule
+        return submodule
+
+    def __dir__(self):
+        """List the module attributes including the not-yet-loaded submodules."""
+        return sorted(set(self.__dict__) | self._lazy_submodules)
+
+
+def lazy_submodules(name, submodules, eager=None):
+    """Make the submodules of a package load lazily.
+
+    To be called at the end of a package's `__init__.py` like this:
+
+    >>> lazy_submodules(__name__, ["bioformats", "misc"])
+
+    When running in Jython, the submodules are imported right away instead.
+
+    Parameters
+    ----------
+    name : str
+        The (fully qualified) name of the package.
+    submodules : list(str)
+        The names of the submodules to be imported on first access.
+    eager : list(str), optional
+        The names of the submodules to be imported right away when running in
+        Jython, by default all of `submodules`. The other ones have to be
+        imported explicitly there.
+    """
+    if sys.platform.startswith("java"):
+        for submodule in submodules if eager is None else eager:
+            importlib.import_module("%s.%s" % (name, submodule))
+        return
+    sys.modules[name] = LazyModule(sys.modules[name], submodules)
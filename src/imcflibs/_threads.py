@@ -0,0 +1,72 @@
+"""Minimal thread pool working in Jython 2.7 and C-Python.
+
+`concurrent.futures` is not available in Python 2.7 / Jython 2.7, so this module
+provides the (small) subset required by the package: calling a function for a
+list of items using a number of worker threads, e.g. to hide the latency of a
+network share while scanning directories or reading files.
+"""
+
+import threading
+
+from ._jython_compat import queue
+
+
+def run_threaded(func, items, threads):
+    """Call a function for each item using a pool of worker threads.
+
+    If one of the calls raises an exception, the remaining items are skipped
+    and the exception is re-raised in the calling thread once all workers have
+    stopped.
+
+    Parameters
+    ----------
+    func : callable
+        The function to call, taking a single item as its argument.
+    items : iterable
+        The items to process.
+    threads : int
+        The number of worker threads to use. With 1 (or less), or if there is
+        only a single item, the calls are done sequentially in the calling
+        thread.
+
+    Returns
+    -------
+    list
+        The results of the calls, in the same order as `items`.
+    """
+    items = list(items)
+    if threads <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    results = [None] * len(items)
+    # a list (instead of a plain variable) allows the workers to record errors
+    # without the `nonlocal` statement that is lacking in Python 2.7:
+    errors = []
+    tasks = queue.Queue()
+
+    def worker():
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            if errors:
+                continue
+            position, item = task
+            try:
+                results[position] = func(item)
+            except Exception as err:  # pylint: disable-msg=broad-except
+                errors.append(err)
+
+    for task in enumerate(items):
+        tasks.put(task)
+    workers = [threading.Thread(target=worker) for _ in range(min(threads, len(items)))]
+    for thread in workers:
+        thread.daemon = True
+        tasks.put(None)
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return results
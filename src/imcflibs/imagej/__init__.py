@@ -1,15 +1,47 @@
 """ImageJ related functions, mostly convenience wrappers and combined workflows.
 
 NOTE: this is only useful for Python (actually Jython) running within Fiji / ImageJ
-and therefore will not be imported by the main 'imcflibs' package unless that
-particular environment is detected.
+and therefore will not be imported by the main 'imcflibs' package unless it is
+being accessed explicitly.
+
+Submodules are imported on first access (e.g. `imcflibs.imagej.bioformats`), so
+a script only pays for loading the Java classes of the modules it actually uses.
 """
 
-from . import bioformats
-from . import misc
-from . import prefs
-from . import projections
-from . import shading
-from . import sjlog
-from . import split
-from . import stitching
+from .._lazy import lazy_submodules as _lazy_submodules
+
+_lazy_submodules(
+    __name__,
+    [
+        "bdv",
+        "bioformats",
+        "gpu",
+        "labelimage",
+        "misc",
+        "objects3d",
+        "omerotools",
+        "prefs",
+        "processing",
+        "projections",
+        "resultstable",
+        "roimanager",
+        "shading",
+        "sjlog",
+        "split",
+        "stitching",
+        "timing",
+        "trackmate",
+    ],
+    # where lazy loading doesn't work (Jython), import the same submodules as
+    # before it had been introduced:
+    eager=[
+        "bioformats",
+        "misc",
+        "prefs",
+        "projections",
+        "shading",
+        "sjlog",
+        "split",
+        "stitching",
+    ],
+)
@@ -33,6 +33,8 @@ ZeissCZIReader = None
 DefaultMetadataOptions = None
 MetadataLevel = None
 DynamicMetadataOptions = None
+ChannelSeparator = None
+ImageProcessorReader = None
 
 # perform the actual imports when running under Jython using `importlib` calls:
 import platform as _python_platform
@@ -49,6 +51,12 @@ if _python_platform.python_implementation() == "Jython":  # pragma: no cover
     MetadataLevel = _loci_formats_in.MetadataLevel
     DynamicMetadataOptions = _loci_formats_in.DynamicMetadataOptions
     MetadataOptions = _loci_formats_in.MetadataOptions
+
+    # not problematic syntax-wise, but not (yet) provided by the mocks:
+    ChannelSeparator = importlib.import_module("loci.formats").ChannelSeparator
+    _loci_plugins_util = importlib.import_module("loci.plugins.util")
+    ImageProcessorReader = _loci_plugins_util.ImageProcessorReader
 del _python_platform
 
 from loci.formats import ImageReader, Memoizer, MetadataTools
+from loci.common import Region
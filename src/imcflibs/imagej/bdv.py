@@ -20,6 +20,7 @@ from ij import IJ
 
 from .. import pathtools
 from ..log import LOG as log
+from .timing import timed
 
 
 # internal template strings used in string formatting (note: the `"""@private"""`
@@ -784,6 +785,7 @@ def backup_xml_files(source_directory, subfolder_name):
         shutil.copy2(xml_file, backup_subfolder)
 
 
+@timed
 def define_dataset_auto(
     project_filename,
     file_path,
@@ -896,6 +898,7 @@ def define_dataset_auto(
     IJ.run("Define Multi-View Dataset", str(options))
 
 
+@timed
 def define_dataset_manual(
     project_filename,
     source_directory,
@@ -954,6 +957,7 @@ def define_dataset_manual(
     IJ.run("Define Multi-View Dataset", str(options))
 
 
+@timed
 def resave_as_h5(
     source_xml_file,
     output_h5_file_path,
@@ -1035,6 +1039,7 @@ def resave_as_h5(
     IJ.run("As HDF5", str(options))
 
 
+@timed
 def flip_axes(source_xml_file, x=False, y=True, z=False):
     """Call BigStitcher's "Flip Axes" command.
 
@@ -1069,6 +1074,7 @@ def flip_axes(source_xml_file, x=False, y=True, z=False):
     backup_xml_files(file_info["path"], "flip_axes")
 
 
+@timed
 def phase_correlation_pairwise_shifts_calculation(
     project_path,
     processing_opts=None,
@@ -1125,6 +1131,7 @@ def phase_correlation_pairwise_shifts_calculation(
     backup_xml_files(file_info["path"], "phase_correlation_shift_calculation")
 
 
+@timed
 def filter_pairwise_shifts(
     project_path,
     min_r=0.7,
@@ -1187,6 +1194,7 @@ def filter_pairwise_shifts(
     backup_xml_files(file_info["path"], "filter_pairwise_shifts")
 
 
+@timed
 def optimize_and_apply_shifts(
     project_path,
     processing_opts=None,
@@ -1240,6 +1248,7 @@ def optimize_and_apply_shifts(
     backup_xml_files(file_info["path"], "optimize_and_apply_shifts")
 
 
+@timed
 def detect_interest_points(
     project_path,
     processing_opts=None,
@@ -1300,6 +1309,7 @@ def detect_interest_points(
     IJ.run("Detect Interest Points for Registration", str(options))
 
 
+@timed
 def interest_points_registration(
     project_path,
     processing_opts=None,
@@ -1370,6 +1380,7 @@ def interest_points_registration(
     IJ.run("Register Dataset based on Interest Points", options)
 
 
+@timed
 def duplicate_transformations(
     project_path,
     transformation_type="channel",
@@ -1466,6 +1477,7 @@ def duplicate_transformations(
     )
 
 
+@timed
 def fuse_dataset(
     project_path,
     processing_opts=None,
@@ -1590,6 +1602,7 @@ def fuse_dataset(
     IJ.run("Image Fusion", str(options))
 
 
+@timed
 def fuse_dataset_bdvp(
     project_path,
     command,
@@ -10,23 +10,67 @@ the corresponding functions provided by ImageJ.
 # Mosts imports will fail with plain C-Python / pylint:
 # pylint: disable-msg=import-error
 
+import atexit
 import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 
 from ij import IJ
 
+from .._jython_compat import queue
+from .._threads import run_threaded
+from ..iotools import MetadataCatalog
 from ..log import LOG as log
-from ..pathtools import gen_name_from_orig
+from ..pathtools import exists, gen_name_from_orig, update_stat_cache
+from .timing import timed
 from ._loci import (
     BF,
+    ChannelSeparator,
     DynamicMetadataOptions,
+    ImageProcessorReader,
     ImageReader,
     ImporterOptions,
     Memoizer,
+    MetadataLevel,
     MetadataTools,
+    Region,
     ZeissCZIReader,
 )
 
 
+# metadata levels supported by the `metadata_level` parameters, from fastest (only
+# the core metadata required to read the pixels) to the full metadata:
+METADATA_LEVELS = ("MINIMUM", "NO_OVERLAYS", "ALL")
+
+
+def _metadata_options(metadata_level):
+    """Create reader options for a given metadata level.
+
+    Parameters
+    ----------
+    metadata_level : str
+        One of the levels in `METADATA_LEVELS`.
+
+    Returns
+    -------
+    loci.formats.in.DynamicMetadataOptions
+
+    Raises
+    ------
+    ValueError
+        Raised in case an unknown metadata level is given.
+    """
+    if metadata_level not in METADATA_LEVELS:
+        raise ValueError(
+            "Invalid metadata level '%s', use one of %s"
+            % (metadata_level, ", ".join(METADATA_LEVELS))
+        )
+    options = DynamicMetadataOptions()
+    options.setMetadataLevel(getattr(MetadataLevel, metadata_level))
+    return options
+
+
 class ImageMetadata(object):
     """A class to store metadata information from an image.
 
@@ -170,6 +214,7 @@ class StageMetadata(object):
         )
 
 
+@timed
 def import_image(
     filename,
     color_mode="color",
@@ -186,6 +231,9 @@ def import_image(
     t_start=None,
     t_end=None,
     t_interval=None,
+    crop=None,
+    resolution=None,
+    virtual=False,
 ):
     """Open an image file using the Bio-Formats importer.
 
@@ -203,7 +251,8 @@ def import_image(
     split_t : bool, optional
         Whether to split the time points into separate ImagePlus objects.
     series_number : int, optional
-        open a specific Bio-Formats series
+        open a specific Bio-Formats series (see `resolution` for the meaning
+        of the index in case the file contains image pyramids)
     c_start : int, optional
         only import a subset of channel starting with this one. Requires to set
         c_end and c_interval.
@@ -231,6 +280,24 @@ def import_image(
     t_interval : int, optional
         only import a subset of time points with thsi interval. Requires to set
         t_start and t_end.
+    crop : (int, int, int, int), optional
+        only import the region given as (x, y, width, height) in pixels of the
+        XY planes. Only the data of this region will be read from the file,
+        making it much cheaper than cropping after the import (e.g. for a small
+        window of a large slide scan).
+    resolution : int, optional
+        open a specific resolution level of the series, 0 being the full
+        resolution (see `get_pyramid_levels()` for the available levels). If
+        given, `series_number` refers to the series *excluding* the resolution
+        levels (default 0), otherwise it refers to the "flattened" series list
+        where every resolution level counts as a separate series (as shown in
+        the Bio-Formats importer dialog). The level is looked up using a reader
+        with the minimum metadata level (see `METADATA_LEVELS`), the importer
+        then parses the file on its own, with its usual metadata settings.
+    virtual : bool, optional
+        open the image(s) as virtual stacks, i.e. planes are only read from the
+        file when being accessed instead of loading everything into memory. Use
+        a `PlaneCache` to avoid re-reading planes that are accessed repeatedly.
 
     Returns
     -------
@@ -248,7 +315,12 @@ def import_image(
     options.setSplitChannels(split_c)
     options.setSplitFocalPlanes(split_z)
     options.setSplitTimepoints(split_t)
+    options.setVirtual(virtual)
     options.setId(filename)
+    if resolution is not None:
+        series_number = _flattened_series_index(
+            filename, series_number or 0, resolution
+        )
     if series_number is not None:
         options.setSeriesOn(series_number, True)
 
@@ -276,12 +348,19 @@ def import_image(
         options.setTEnd(series_number, t_end)
         options.setTStep(series_number, t_interval)
 
+    if crop is not None:
+        if series_number is None:
+            series_number = 0
+        options.setCrop(True)
+        options.setCropRegion(series_number, Region(*crop))
+
     log.info("Reading [%s]", filename)
     orig_imps = BF.openImagePlus(options)
     log.debug("Opened [%s] %s", filename, type(orig_imps))
     return orig_imps
 
 
+@timed
 def export(imp, filename, overwrite=False):
     """Export an ImagePlus object to a given file.
 
@@ -309,17 +388,28 @@ def export(imp, filename, overwrite=False):
             "Bio-Formats 6.0.x Exporter bug!"
         )
         imp.calibration.unit = "m"
-    if os.path.exists(filename):
+    if exists(filename):
         if not overwrite:
             raise IOError("file [%s] already exists!" % filename)
         log.debug("Removing existing file [%s]...", filename)
         os.remove(filename)
 
     IJ.run(imp, "Bio-Formats Exporter", "save=[" + filename + "]")
+    update_stat_cache(filename)
     log.debug("Exporting finished.")
 
 
-def export_using_orig_name(imp, path, orig_name, tag, suffix, overwrite=False):
+def export_using_orig_name(
+    imp,
+    path,
+    orig_name,
+    tag,
+    suffix,
+    overwrite=False,
+    cache=None,
+    inputs=None,
+    params=None,
+):
     """Export an image to a given path, deriving the name from the input file.
 
     The input filename is stripped to its pure file name, without any path or
@@ -341,6 +431,13 @@ def export_using_orig_name(imp, path, orig_name, tag, suffix, overwrite=False):
         The new file name suffix, which also sets the file format for BF.
     overwrite : bool
         A switch to indicate existing files should be overwritten.
+    cache : imcflibs.iotools.ResultCache, optional
+        If given, the exported file will be recorded in this cache. The cache is
+        not saved, use its `save()` method once all results are recorded.
+    inputs : list(str), optional
+        The input files to record in the cache, by default `[orig_name]`.
+    params : dict, optional
+        The processing parameters to record in the cache.
 
     Returns
     -------
@@ -349,10 +446,422 @@ def export_using_orig_name(imp, path, orig_name, tag, suffix, overwrite=False):
     """
     out_file = gen_name_from_orig(path, orig_name, tag, suffix)
     export(imp, out_file, overwrite)
+    if cache is not None:
+        cache.record(out_file, inputs or [orig_name], params, save=False)
     return out_file
 
 
-def get_series_info_from_ome_metadata(path_to_file, skip_labels=False):
+def _tile_regions(size_x, size_y, tile_size):
+    """Split a plane into tiles.
+
+    Parameters
+    ----------
+    size_x : int
+        The width of the plane.
+    size_y : int
+        The height of the plane.
+    tile_size : int or (int, int) or None
+        The (maximum) width and height of the tiles, None for a single tile
+        covering the entire plane.
+
+    Returns
+    -------
+    list of (int, int, int, int)
+        The tiles as (x, y, width, height) tuples, row by row.
+    """
+    if tile_size is None:
+        return [(0, 0, size_x, size_y)]
+    if isinstance(tile_size, int):
+        tile_size = (tile_size, tile_size)
+    tile_w, tile_h = tile_size
+    return [
+        (x, y, min(tile_w, size_x - x), min(tile_h, size_y - y))
+        for y in range(0, size_y, tile_h)
+        for x in range(0, size_x, tile_w)
+    ]
+
+
+def iter_planes(
+    filename,
+    series=0,
+    channels=None,
+    slices=None,
+    frames=None,
+    tile_size=None,
+    prefetch=2,
+    metadata_level="MINIMUM",
+):
+    """Read an image plane by plane (or tile by tile) without importing it.
+
+    In contrast to `import_image()`, this doesn't require the selected data to
+    fit into memory. The planes are read in a background thread, at most
+    `prefetch` of them are kept in a buffer until they are requested.
+
+    Parameters
+    ----------
+    filename : str
+        The full path to the image file.
+    series : int, optional
+        The series to read, by default 0 (refers to flattened resolutions,
+        i.e. resolution levels count as separate series).
+    channels : list(int), optional
+        The (zero-based) channels to read, by default all.
+    slices : list(int), optional
+        The (zero-based) Z-slices to read, by default all.
+    frames : list(int), optional
+        The (zero-based) timepoints to read, by default all.
+    tile_size : int or (int, int), optional
+        If given, planes are split into tiles of (at most) this width and height
+        (a single number will be used for both), by default None.
+    prefetch : int, optional
+        The number of planes (or tiles) to read ahead, by default 2. Use 0 to
+        read them in the calling thread when being requested.
+    metadata_level : str, optional
+        The amount of metadata to be parsed (see `METADATA_LEVELS`), by default
+        "MINIMUM" as only the pixel data is read.
+
+    Yields
+    ------
+    (ij.process.ImageProcessor, (int, int, int, int), (int, int))
+        The plane (or tile), its (c, z, t, series) index and the (x, y) position
+        of the tile in the plane (0, 0 for entire planes).
+
+    Example
+    -------
+    >>> for proc, (c, z, t, _), _ in iter_planes("/data/stack.ics"):
+    ...     stats = proc.getStatistics()
+    """
+    reader = ImageProcessorReader(ChannelSeparator(ImageReader()))
+    # close the reader if the setup fails, a flag is used instead of catching
+    # the exception so Java exceptions (not derived from `Exception` in Jython)
+    # are covered as well:
+    ready = False
+    try:
+        reader.setMetadataOptions(_metadata_options(metadata_level))
+        reader.setId(str(filename))
+        reader.setSeries(series)
+        if channels is None:
+            channels = range(reader.getSizeC())
+        if slices is None:
+            slices = range(reader.getSizeZ())
+        if frames is None:
+            frames = range(reader.getSizeT())
+        tiles = _tile_regions(reader.getSizeX(), reader.getSizeY(), tile_size)
+        ready = True
+    finally:
+        if not ready:
+            reader.close()
+
+    def read():
+        for t in frames:
+            for z in slices:
+                for c in channels:
+                    plane = reader.getIndex(z, c, t)
+                    for x, y, width, height in tiles:
+                        proc = reader.openProcessors(plane, x, y, width, height)[0]
+                        yield proc, (c, z, t, series), (x, y)
+
+    if prefetch < 1:
+        try:
+            for item in read():
+                yield item
+        finally:
+            reader.close()
+        return
+
+    buffer = queue.Queue(prefetch)
+    stop = threading.Event()
+
+    def put(message):
+        """Put a message into the buffer, giving up if the consumer stopped."""
+        while not stop.is_set():
+            try:
+                buffer.put(message, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def producer():
+        try:
+            for item in read():
+                if not put(("item", item)):
+                    return
+        except Exception as err:  # pylint: disable-msg=broad-except
+            put(("error", err))
+            return
+        put(("end", None))
+
+    thread = threading.Thread(target=producer)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            kind, value = buffer.get()
+            if kind == "end":
+                break
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        # also reached if the consumer stops early (closing the generator):
+        stop.set()
+        thread.join()
+        reader.close()
+
+
+class PlaneCache(object):
+    """A bounded LRU cache for the planes of a (virtual) stack.
+
+    Every access to a plane of a virtual stack reads it from the file again.
+    Wrapping the stack in a `PlaneCache` keeps the most recently used planes in
+    memory, so repeatedly accessing nearby planes (e.g. in a sliding window) is
+    cheap while memory usage stays bounded to `size` planes.
+
+    Other attributes and methods are passed on to the wrapped stack.
+
+    WARNING: the cached processors are shared, modifying them (e.g. by filtering
+    in-place) will also modify the ones returned by later calls!
+
+    Parameters
+    ----------
+    stack : ij.ImageStack
+        The stack to wrap, e.g. `imp.getStack()` of an ImagePlus imported with
+        `import_image(..., virtual=True)`.
+    size : int, optional
+        The maximum number of planes to keep in memory, by default 8.
+
+    Example
+    -------
+    >>> imps = import_image("/data/stack.ics", virtual=True)
+    >>> planes = PlaneCache(imps[0].getStack())
+    >>> for z in range(2, planes.getSize() + 1):
+    ...     # every plane is only read once, although being used twice:
+    ...     previous, current = planes.getProcessor(z - 1), planes.getProcessor(z)
+    """
+
+    def __init__(self, stack, size=8):
+        self.stack = stack
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._planes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        """Pass on attributes not defined here to the wrapped stack."""
+        return getattr(self.stack, name)
+
+    def getProcessor(self, n):  # pylint: disable-msg=invalid-name
+        """Get a plane, using a cached one if possible.
+
+        Parameters
+        ----------
+        n : int
+            The (one-based) index of the plane in the stack.
+
+        Returns
+        -------
+        ij.process.ImageProcessor
+        """
+        with self._lock:
+            proc = self._planes.pop(n, None)
+            if proc is not None:
+                self.hits += 1
+                self._planes[n] = proc
+                return proc
+            self.misses += 1
+
+        proc = self.stack.getProcessor(n)
+        with self._lock:
+            self._planes[n] = proc
+            while len(self._planes) > self.size:
+                self._planes.popitem(last=False)
+        return proc
+
+    def clear(self):
+        """Discard all cached planes."""
+        with self._lock:
+            self._planes.clear()
+
+
+class _ReaderPool(object):
+    """A bounded pool of initialized Bio-Formats readers.
+
+    Readers are keyed by the absolute path of the image file, its modification
+    time, the resolution flattening setting and the metadata level. A reader is
+    checked out of the pool for exclusive use and released back into it
+    afterwards, so threads working on the same file never share a reader.
+    Readers for files that have been modified are closed, and if the pool is
+    full, the least recently released reader is closed.
+
+    Parameters
+    ----------
+    size : int, optional
+        The maximum number of idle readers to keep open, by default 4.
+    """
+
+    def __init__(self, size=4):
+        self.size = size
+        self._readers = OrderedDict()
+        self._serial = 0
+        self._lock = threading.Lock()
+
+    def checkout(self, path, flattened=True, metadata_level="ALL"):
+        """Get a reader for a file, re-using a pooled one if possible.
+
+        Parameters
+        ----------
+        path : str
+            The path to the image file.
+        flattened : bool, optional
+            The value for `setFlattenedResolutions()`, by default True.
+        metadata_level : str, optional
+            One of the levels in `METADATA_LEVELS`, by default "ALL".
+
+        Returns
+        -------
+        tuple
+            A tuple (key, reader, ome_meta) to be passed to `release()` once the
+            reader isn't used any more.
+        """
+        options = _metadata_options(metadata_level)
+        path = os.path.abspath(str(path))
+        key = (path, os.stat(path).st_mtime, flattened, metadata_level)
+        entry = None
+        stale = []
+        with self._lock:
+            for serial, pooled in list(self._readers.items()):
+                if pooled[0] == key and entry is None:
+                    entry = self._readers.pop(serial)
+                elif pooled[0][0] == path and pooled[0][1] != key[1]:
+                    stale.append(self._readers.pop(serial))
+        for pooled in stale:
+            log.debug("Image file has been modified, closing reader: %s", path)
+            pooled[1].close()
+
+        if entry is not None:
+            entry[1].setSeries(0)
+            return entry
+
+        log.debug("Initializing Bio-Formats reader for [%s]...", path)
+        if metadata_level == "ALL":
+            reader = Memoizer(ImageReader())
+        else:
+            # a memo file holds the metadata of the level it has been written
+            # with, so only use it for the full one (reduced levels are fast):
+            reader = ImageReader()
+        reader.setMetadataOptions(options)
+        reader.setFlattenedResolutions(flattened)
+        ome_meta = MetadataTools.createOMEXMLMetadata()
+        reader.setMetadataStore(ome_meta)
+        reader.setId(path)
+        return key, reader, ome_meta
+
+    def release(self, entry):
+        """Put a reader (obtained from `checkout()`) back into the pool.
+
+        Parameters
+        ----------
+        entry : tuple
+            The tuple returned by `checkout()`.
+        """
+        evicted = []
+        with self._lock:
+            self._serial += 1
+            self._readers[self._serial] = entry
+            while len(self._readers) > self.size:
+                evicted.append(self._readers.popitem(last=False)[1])
+        for pooled in evicted:
+            pooled[1].close()
+
+    def close(self, path=None):
+        """Close pooled readers, either the ones of a given file or all.
+
+        Parameters
+        ----------
+        path : str, optional
+            The image file whose readers should be closed. If omitted, all
+            readers in the pool will be closed.
+        """
+        if path is not None:
+            path = os.path.abspath(str(path))
+        with self._lock:
+            closing = [
+                serial
+                for serial, pooled in self._readers.items()
+                if path is None or pooled[0][0] == path
+            ]
+            entries = [self._readers.pop(serial) for serial in closing]
+        for pooled in entries:
+            pooled[1].close()
+
+
+_READERS = _ReaderPool()
+
+
+@contextmanager
+def cached_reader(path, flattened=True, metadata_level="ALL"):
+    """Context manager providing an initialized reader from a shared pool.
+
+    Querying different metadata of the same file (e.g. series count, calibration
+    and stage positions) only requires the (potentially very expensive) call to
+    `setId()` once that way. Readers using the full metadata level are wrapped
+    in a `loci.formats.Memoizer`, so even a new reader will initialize faster
+    for files that have been opened before. Pooled readers are automatically
+    re-initialized if the file has been modified.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The path to the image file.
+    flattened : bool, optional
+        Whether to treat resolution levels as separate series (see
+        `loci.formats.IFormatReader.setFlattenedResolutions()`), by default
+        True.
+    metadata_level : str, optional
+        The amount of metadata to be parsed, one of `METADATA_LEVELS`. Use
+        "MINIMUM" for a (much) faster initialization if only the dimensions
+        are required, by default "ALL".
+
+    Yields
+    ------
+    (loci.formats.IFormatReader, loci.formats.ome.OMEXMLMetadata)
+        The reader (*NOT* to be closed by the caller, use `close_readers()`
+        instead) and its OME metadata store.
+
+    Example
+    -------
+    >>> with cached_reader("/data/image.czi") as (reader, ome_meta):
+    ...     series_count = reader.getSeriesCount()
+    """
+    entry = _READERS.checkout(path, flattened, metadata_level)
+    try:
+        yield entry[1], entry[2]
+    finally:
+        _READERS.release(entry)
+
+
+def close_readers(path=None):
+    """Close pooled Bio-Formats readers (see `cached_reader()`).
+
+    Pooled readers keep their image files open, which prevents them from being
+    moved or deleted on Windows. Batch functions like `get_stage_coords()` close
+    the readers of the files they have processed, call this once done with
+    files queried through single-file functions like `get_metadata_from_file()`.
+
+    Parameters
+    ----------
+    path : str, optional
+        The image file whose readers should be closed. If omitted, all pooled
+        readers will be closed.
+    """
+    _READERS.close(path)
+
+
+def get_series_info_from_ome_metadata(
+    path_to_file, skip_labels=False, metadata_level="ALL"
+):
     """Get the Bio-Formats series information from a file on disk.
 
     Useful to access specific images in container formats like .czi, .nd2, .lif...
@@ -363,6 +872,10 @@ def get_series_info_from_ome_metadata(path_to_file, skip_labels=False):
         The full path to the image file.
     skip_labels : bool, optional
         If True, excludes label and macro images from the series count (default: False).
+    metadata_level : str, optional
+        The amount of metadata to be parsed, one of `METADATA_LEVELS`. Using
+        "MINIMUM" is sufficient (and much faster) unless `skip_labels` is set,
+        which requires the image names (default: "ALL").
 
     Returns
     -------
@@ -379,45 +892,107 @@ def get_series_info_from_ome_metadata(path_to_file, skip_labels=False):
     """
 
     if not skip_labels:
-        reader = ImageReader()
-        reader.setFlattenedResolutions(False)
-        ome_meta = MetadataTools.createOMEXMLMetadata()
-        reader.setMetadataStore(ome_meta)
-        reader.setId(path_to_file)
-        series_count = reader.getSeriesCount()
+        with cached_reader(path_to_file, False, metadata_level) as (reader, _):
+            series_count = reader.getSeriesCount()
 
-        reader.close()
         return series_count, range(series_count)
 
     else:
-        reader = ImageReader()
-        # reader.setFlattenedResolutions(True)
-        ome_meta = MetadataTools.createOMEXMLMetadata()
-        reader.setMetadataStore(ome_meta)
-        reader.setId(path_to_file)
-        series_count = reader.getSeriesCount()
+        with cached_reader(path_to_file, True, metadata_level) as (reader, ome_meta):
+            series_count = reader.getSeriesCount()
 
-        series_ids = []
-        series_names = []
-        x = 0
-        y = 0
-        for i in range(series_count):
-            reader.setSeries(i)
+            series_ids = []
+            series_names = []
+            x = 0
+            y = 0
+            for i in range(series_count):
+                reader.setSeries(i)
 
-            if reader.getSizeX() > x and reader.getSizeY() > y:
-                name = ome_meta.getImageName(i)
+                if reader.getSizeX() > x and reader.getSizeY() > y:
+                    name = ome_meta.getImageName(i)
 
-                if name not in ["label image", "macro image"]:
-                    series_ids.append(i)
-                    series_names.append(name)
+                    if name not in ["label image", "macro image"]:
+                        series_ids.append(i)
+                        series_names.append(name)
 
-            x = reader.getSizeX()
-            y = reader.getSizeY()
+                x = reader.getSizeX()
+                y = reader.getSizeY()
 
         print(series_names)
         return len(series_ids), series_ids
 
 
+def get_pyramid_levels(path_to_file, metadata_level="ALL"):
+    """Get the resolution levels (image pyramids) of all series in a file.
+
+    Parameters
+    ----------
+    path_to_file : str
+        The full path to the image file.
+    metadata_level : str, optional
+        The amount of metadata to be parsed (see `METADATA_LEVELS`), "MINIMUM"
+        is sufficient, by default "ALL" to share the reader with other calls.
+
+    Returns
+    -------
+    list(list((int, int)))
+        One list per series (excluding resolution levels) containing the size
+        (x, y) of each resolution level, starting with the full resolution. For
+        series without a pyramid, the list has a single entry.
+
+    Example
+    -------
+    >>> get_pyramid_levels("slide.czi")
+    [[(40000, 30000), (20000, 15000), (10000, 7500)], [(1024, 768)]]
+    """
+    levels = []
+    with cached_reader(path_to_file, False, metadata_level) as (reader, _):
+        for series in range(reader.getSeriesCount()):
+            reader.setSeries(series)
+            sizes = []
+            for level in range(reader.getResolutionCount()):
+                reader.setResolution(level)
+                sizes.append((reader.getSizeX(), reader.getSizeY()))
+            reader.setResolution(0)
+            levels.append(sizes)
+    return levels
+
+
+def _flattened_series_index(path_to_file, series, resolution):
+    """Get the index of a resolution level in the flattened series list.
+
+    Parameters
+    ----------
+    path_to_file : str
+        The full path to the image file.
+    series : int
+        The series index, excluding resolution levels.
+    resolution : int
+        The resolution level, 0 being the full resolution.
+
+    Returns
+    -------
+    int
+        The index of the series when treating resolution levels as separate
+        series, as used by the Bio-Formats importer.
+
+    Raises
+    ------
+    ValueError
+        Raised in case the series doesn't have the requested resolution level.
+    """
+    # only the core metadata is required for this:
+    with cached_reader(path_to_file, False, "MINIMUM") as (reader, _):
+        reader.setSeries(series)
+        count = reader.getResolutionCount()
+        if not 0 <= resolution < count:
+            raise ValueError(
+                "Series %s of [%s] has %s resolution level(s), can't use %s!"
+                % (series, path_to_file, count, resolution)
+            )
+        return reader.seriesToCoreIndex(series) + resolution
+
+
 def write_bf_memoryfile(path_to_file):
     """Write a BF memo-file so subsequent access to the same file is faster.
 
@@ -434,196 +1009,438 @@ def write_bf_memoryfile(path_to_file):
     reader.close()
 
 
-def get_metadata_from_file(path_to_image):
+_CATALOGS = {}
+_CATALOGS_LOCK = threading.Lock()
+
+# number of new catalog entries after which all catalogs are saved, as the
+# `atexit` handler is not reliably called when Fiji (or a script) is stopped:
+CATALOG_SAVE_INTERVAL = 100
+
+# number of entries stored since the catalogs have been saved the last time:
+_unsaved_entries = 0
+
+
+def _get_catalog(path):
+    """Get the (shared) metadata catalog of the directory containing a file.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The image file.
+
+    Returns
+    -------
+    imcflibs.iotools.MetadataCatalog
+    """
+    directory = os.path.dirname(os.path.abspath(str(path)))
+    with _CATALOGS_LOCK:
+        catalog = _CATALOGS.get(directory)
+        if catalog is None:
+            catalog = _CATALOGS[directory] = MetadataCatalog(directory)
+    return catalog
+
+
+def save_catalogs():
+    """Save all metadata catalogs having unsaved changes.
+
+    Functions using the catalogs (e.g. `get_metadata_from_file()`) don't save
+    them after each file, as that would rewrite the entire catalog every time.
+    Instead, they are saved every `CATALOG_SAVE_INTERVAL` new entries and at the
+    end of batch functions like `get_stage_coords()`. Call this once a batch of
+    files has been processed with `get_metadata_from_file()`, to save the
+    remaining entries. It is also registered to be called when the interpreter
+    exits, but that doesn't happen reliably in Fiji.
+    """
+    global _unsaved_entries  # pylint: disable-msg=global-statement
+    with _CATALOGS_LOCK:
+        catalogs = list(_CATALOGS.values())
+        _unsaved_entries = 0
+    for catalog in catalogs:
+        if catalog.modified:
+            catalog.save()
+
+
+atexit.register(save_catalogs)
+
+
+def _store_in_catalog(catalog, path, section, data):
+    """Store metadata in a catalog, saving all of them every few entries.
+
+    Parameters
+    ----------
+    catalog : imcflibs.iotools.MetadataCatalog
+        The catalog of the directory containing the file.
+    path : str or pathlib.Path
+        The file the metadata belongs to.
+    section : str
+        The section of the catalog.
+    data : dict
+        The metadata, has to be JSON-serializable.
+    """
+    global _unsaved_entries  # pylint: disable-msg=global-statement
+    catalog.set(path, section, data, save=False)
+    with _CATALOGS_LOCK:
+        _unsaved_entries += 1
+        due = _unsaved_entries >= CATALOG_SAVE_INTERVAL
+    if due:
+        save_catalogs()
+
+
+def _to_float(value):
+    """Convert a (Java) number to a float, keeping None."""
+    return None if value is None else float(value)
+
+
+def _quantity_value(quantity, default=None):
+    """Get the value of an OME quantity (e.g. a `Length`) as a float.
+
+    Parameters
+    ----------
+    quantity : ome.units.quantity.Quantity or None
+        The quantity, e.g. as returned by `getPlanePositionX()`.
+    default : float, optional
+        The value to use if the quantity is None, by default None.
+
+    Returns
+    -------
+    float or None
+    """
+    return _to_float(getattr(quantity, "value", lambda: default)())
+
+
+# the `ImageMetadata` attributes holding OME integer objects:
+_METADATA_INT_KEYS = (
+    "pixel_width",
+    "pixel_height",
+    "slice_count",
+    "channel_count",
+    "timepoints_count",
+)
+
+
+def get_metadata_from_file(path_to_image, use_cache=False, metadata_level="ALL"):
     """Extract metadata from an image file using Bio-Formats.
 
     This function reads an image file using the Bio-Formats library and extracts
     various metadata properties including physical dimensions, pixel dimensions,
     and other image characteristics.
 
+    The file is read using a pooled reader (see `cached_reader()`) that keeps it
+    open, call `close_readers()` once done with a batch of files.
+
     Parameters
     ----------
     path_to_image : str or pathlib.Path
         Path to the image file from which metadata should be extracted.
+    use_cache : bool, optional
+        If set to True, the metadata is taken from (or stored in) the catalog
+        of the file's directory (see `imcflibs.iotools.MetadataCatalog`), so
+        Bio-Formats is only used if the file is new or has changed. The values
+        are plain Python types then (e.g. `int` instead of the OME
+        `PositiveInteger` and `str` instead of the `DimensionOrder` and
+        `PixelType` objects returned otherwise). New entries are only saved
+        every `CATALOG_SAVE_INTERVAL` files, call `save_catalogs()` after
+        processing a batch of files to save the remaining ones. By default
+        False.
+    metadata_level : str, optional
+        The amount of metadata to be parsed, one of `METADATA_LEVELS`. With
+        "MINIMUM" the physical sizes and unit might not be available (being
+        None then) for some formats, by default "ALL".
 
     Returns
     -------
     ImageMetadata
         An instance of `imcflibs.imagej.bioformats.ImageMetadata` containing the extracted metadata.
     """
+    section = "image"
+    if metadata_level != "ALL":
+        section = "image-" + metadata_level.lower()
+    catalog = _get_catalog(path_to_image) if use_cache else None
+    if catalog is not None:
+        cached = catalog.get(path_to_image, section)
+        if cached is not None:
+            log.debug("Using cached metadata for [%s].", path_to_image)
+            return ImageMetadata(**dict((str(k), v) for k, v in cached.items()))
+
+    # series 0 is the same with and without flattened resolutions, so the reader
+    # can be shared with `get_stage_coords()` and similar:
+    with cached_reader(path_to_image, False, metadata_level) as (_, ome_meta):
+        size_x = ome_meta.getPixelsPhysicalSizeX(0)
+        metadata = ImageMetadata(
+            unit_width=_quantity_value(size_x),
+            unit_height=_quantity_value(ome_meta.getPixelsPhysicalSizeY(0)),
+            unit_depth=_quantity_value(ome_meta.getPixelsPhysicalSizeZ(0)),
+            unit=size_x.unit().symbol if size_x is not None else None,
+            pixel_width=ome_meta.getPixelsSizeX(0),
+            pixel_height=ome_meta.getPixelsSizeY(0),
+            slice_count=ome_meta.getPixelsSizeZ(0),
+            channel_count=ome_meta.getPixelsSizeC(0),
+            timepoints_count=ome_meta.getPixelsSizeT(0),
+            dimension_order=ome_meta.getPixelsDimensionOrder(0),
+            pixel_type=ome_meta.getPixelsType(0),
+        )
 
-    reader = ImageReader()
-    ome_meta = MetadataTools.createOMEXMLMetadata()
-    reader.setMetadataStore(ome_meta)
-    reader.setId(str(path_to_image))
-
-    metadata = ImageMetadata(
-        unit_width=ome_meta.getPixelsPhysicalSizeX(0).value(),
-        unit_height=ome_meta.getPixelsPhysicalSizeY(0).value(),
-        unit_depth=ome_meta.getPixelsPhysicalSizeZ(0).value(),
-        unit=ome_meta.getPixelsPhysicalSizeX(0).unit().symbol,
-        pixel_width=ome_meta.getPixelsSizeX(0),
-        pixel_height=ome_meta.getPixelsSizeY(0),
-        slice_count=ome_meta.getPixelsSizeZ(0),
-        channel_count=ome_meta.getPixelsSizeC(0),
-        timepoints_count=ome_meta.getPixelsSizeT(0),
-        dimension_order=ome_meta.getPixelsDimensionOrder(0),
-        pixel_type=ome_meta.getPixelsType(0),
-    )
-    reader.close()
+    if catalog is None:
+        return metadata
 
-    return metadata
+    # the catalog can only store (and return) plain types, use them in both
+    # cases to get consistent results:
+    plain = metadata.to_dict().copy()
+    for key in _METADATA_INT_KEYS:
+        plain[key] = plain[key].getValue()
+    for key in ("dimension_order", "pixel_type"):
+        plain[key] = str(plain[key])
+    _store_in_catalog(catalog, path_to_image, section, plain)
 
+    return ImageMetadata(**plain)
 
-def get_stage_coords(filenames):
-    """Get stage coordinates and calibration for a given list of images.
+
+def _read_stage_info(image, first=False):
+    """Extract the stage metadata of a single file using Bio-Formats.
 
     Parameters
     ----------
-    filenames : list of str
-        List of image filepaths.
+    image : str
+        The image file.
+    first : bool, optional
+        Whether the file is the first one of the list, which is the only one
+        the values not depending on the series (dimensions, calibration etc.)
+        are read from, by default False.
 
     Returns
     -------
-    StageMetadata
-        An object containing extracted stage metadata.
+    dict
+        The file-specific values required by `get_stage_coords()` as plain
+        (JSON-serializable) types. The `series` entry contains one list per
+        series (skipping macro images) with the series name (None if the file
+        name should be used instead), the stage position (x, y, z) and the
+        physical pixel size (x, y, z). The other entries are only present if
+        `first` is True.
     """
-    # Initialize lists to store stage coordinates and series names
-    stage_coordinates_x = []
-    stage_coordinates_y = []
-    stage_coordinates_z = []
-    series_names = []
-
-    # Intiialize default values
-    dimensions = 2
-    image_calibration = []
-    calibration_unit = "unknown"
-    image_dimensions_czt = []
-    max_size = []
-
-    # Initialize max_size variables to track the maximums
-    max_phys_size_x = 0.0
-    max_phys_size_y = 0.0
-    max_phys_size_z = 0.0
-
-    for counter, image in enumerate(filenames):
-        reader = ImageReader()
-        reader.setFlattenedResolutions(False)
-        ome_meta = MetadataTools.createOMEXMLMetadata()
-        reader.setMetadataStore(ome_meta)
-        reader.setId(str(image))
+    info = {}
+    with cached_reader(image, flattened=False) as (reader, ome_meta):
         series_count = reader.getSeriesCount()
+        if first:
+            info = _read_calibration(reader, ome_meta)
 
-        # Process only the first image to get values not dependent on series
-        if counter == 0:
-            frame_size_x = reader.getSizeX()
-            frame_size_y = reader.getSizeY()
-            frame_size_z = reader.getSizeZ()
-            frame_size_c = reader.getSizeC()
-            frame_size_t = reader.getSizeT()
-
-            dimensions = 2 if frame_size_z == 1 else 3
-
-            # Retrieve physical size coordinates safely
-            phys_size_x = getattr(
-                ome_meta.getPixelsPhysicalSizeX(0), "value", lambda: 1.0
-            )()
-            phys_size_y = getattr(
-                ome_meta.getPixelsPhysicalSizeY(0), "value", lambda: 1.0
-            )()
-            phys_size_z = getattr(
-                ome_meta.getPixelsPhysicalSizeZ(0), "value", lambda: None
-            )()
-
-            z_interval = phys_size_z if phys_size_z is not None else 1.0
-
-            # Handle missing Z calibration
-            if phys_size_z is None and frame_size_z > 1:
-                first_plane = getattr(
-                    ome_meta.getPlanePositionZ(0, 0), "value", lambda: 0
-                )()
-                next_plane_index = frame_size_c + frame_size_t - 1
-                second_plane = getattr(
-                    ome_meta.getPlanePositionZ(0, next_plane_index), "value", lambda: 0
-                )()
-                z_interval = abs(first_plane - second_plane)
-
-            image_calibration = [phys_size_x, phys_size_y, z_interval]
-            calibration_unit = (
-                getattr(
-                    ome_meta.getPixelsPhysicalSizeX(0).unit(),
-                    "getSymbol",
-                    lambda: "unknown",
-                )()
-                if phys_size_x
-                else "unknown"
-            )
-            image_dimensions_czt = [frame_size_c, frame_size_z, frame_size_t]
-
-        reader.close()
-
+        series_info = []
         for series in range(series_count):
-            if ome_meta.getImageName(series) == "macro image":
+            name = ome_meta.getImageName(series)
+            if name == "macro image":
                 continue
 
-            if series_count > 1 and not str(image).endswith(".vsi"):
-                series_names.append(ome_meta.getImageName(series))
-            else:
-                series_names.append(str(image))
-
-            current_position_x = getattr(
-                ome_meta.getPlanePositionX(series, 0), "value", lambda: 0
-            )()
-            current_position_y = getattr(
-                ome_meta.getPlanePositionY(series, 0), "value", lambda: 0
-            )()
-            current_position_z = getattr(
-                ome_meta.getPlanePositionZ(series, 0), "value", lambda: 1.0
-            )()
-
-            max_phys_size_x = max(
-                max_phys_size_x, ome_meta.getPixelsPhysicalSizeX(series).value()
-            )
-            max_phys_size_y = max(
-                max_phys_size_y, ome_meta.getPixelsPhysicalSizeY(series).value()
-            )
-            max_phys_size_z = max(
-                max_phys_size_z,
-                ome_meta.getPixelsPhysicalSizeZ(series).value()
-                if phys_size_z
-                else z_interval,
+            if series_count == 1 or str(image).endswith(".vsi"):
+                name = None
+
+            series_info.append(
+                [
+                    name,
+                    _quantity_value(ome_meta.getPlanePositionX(series, 0), 0),
+                    _quantity_value(ome_meta.getPlanePositionY(series, 0), 0),
+                    _quantity_value(ome_meta.getPlanePositionZ(series, 0), 1.0),
+                    _to_float(ome_meta.getPixelsPhysicalSizeX(series).value()),
+                    _to_float(ome_meta.getPixelsPhysicalSizeY(series).value()),
+                    _quantity_value(ome_meta.getPixelsPhysicalSizeZ(series)),
+                ]
             )
 
-            stage_coordinates_x.append(current_position_x)
-            stage_coordinates_y.append(current_position_y)
-            stage_coordinates_z.append(current_position_z)
+    info["series"] = series_info
+    return info
+
+
+def _read_calibration(reader, ome_meta):
+    """Extract the values not depending on the series from an initialized reader.
+
+    Parameters
+    ----------
+    reader : loci.formats.IFormatReader
+        The reader, initialized with the first file of the list.
+    ome_meta : loci.formats.meta.IMetadata
+        The metadata store of the reader.
+
+    Returns
+    -------
+    dict
+        The dimensions, calibration and sizes as used by `_merge_stage_info()`.
+    """
+    frame_size_z = reader.getSizeZ()
+    frame_size_c = reader.getSizeC()
+    frame_size_t = reader.getSizeT()
+
+    # Retrieve physical size coordinates safely
+    phys_size_x = getattr(ome_meta.getPixelsPhysicalSizeX(0), "value", lambda: 1.0)()
+    phys_size_y = getattr(ome_meta.getPixelsPhysicalSizeY(0), "value", lambda: 1.0)()
+    phys_size_z = getattr(ome_meta.getPixelsPhysicalSizeZ(0), "value", lambda: None)()
+
+    z_interval = phys_size_z if phys_size_z is not None else 1.0
+
+    # Handle missing Z calibration
+    if phys_size_z is None and frame_size_z > 1:
+        first_plane = getattr(ome_meta.getPlanePositionZ(0, 0), "value", lambda: 0)()
+        next_plane_index = frame_size_c + frame_size_t - 1
+        second_plane = getattr(
+            ome_meta.getPlanePositionZ(0, next_plane_index), "value", lambda: 0
+        )()
+        z_interval = abs(first_plane - second_plane)
+
+    calibration_unit = (
+        getattr(
+            ome_meta.getPixelsPhysicalSizeX(0).unit(),
+            "getSymbol",
+            lambda: "unknown",
+        )()
+        if phys_size_x
+        else "unknown"
+    )
+
+    return {
+        "dimensions": 2 if frame_size_z == 1 else 3,
+        "calibration": [
+            _to_float(phys_size_x),
+            _to_float(phys_size_y),
+            _to_float(z_interval),
+        ],
+        "phys_size_z": _to_float(phys_size_z),
+        "calibration_unit": calibration_unit,
+        "czt": [frame_size_c, frame_size_z, frame_size_t],
+    }
+
 
-    max_size = [max_phys_size_x, max_phys_size_y, max_phys_size_z]
+def _merge_stage_info(filenames, infos):
+    """Combine the stage metadata of multiple files.
+
+    Values not depending on the series (dimensions, calibration etc.) are taken
+    from the first file.
+
+    Parameters
+    ----------
+    filenames : list of str
+        List of image filepaths.
+    infos : list of dict
+        The results of `_read_stage_info()` for each file, in the same order.
+
+    Returns
+    -------
+    StageMetadata
+    """
+    if not infos:
+        return StageMetadata()
+
+    first = infos[0]
+    phys_size_x, phys_size_y, z_interval = first["calibration"]
+    phys_size_z = first["phys_size_z"]
+
+    stage_coordinates_x = []
+    stage_coordinates_y = []
+    stage_coordinates_z = []
+    series_names = []
+    max_size = [0.0, 0.0, 0.0]
+
+    for image, info in zip(filenames, infos):
+        for name, pos_x, pos_y, pos_z, size_x, size_y, size_z in info["series"]:
+            series_names.append(name if name is not None else str(image))
+            stage_coordinates_x.append(pos_x)
+            stage_coordinates_y.append(pos_y)
+            stage_coordinates_z.append(pos_z)
+            if not phys_size_z or size_z is None:
+                size_z = z_interval
+            max_size = [
+                max(max_size[0], size_x),
+                max(max_size[1], size_y),
+                max(max_size[2], size_z),
+            ]
 
     relative_coordinates_x_px = [
-        (stage_coordinates_x[i] - stage_coordinates_x[0]) / (phys_size_x or 1.0)
-        for i in range(len(stage_coordinates_x))
+        (x - stage_coordinates_x[0]) / (phys_size_x or 1.0) for x in stage_coordinates_x
     ]
     relative_coordinates_y_px = [
-        (stage_coordinates_y[i] - stage_coordinates_y[0]) / (phys_size_y or 1.0)
-        for i in range(len(stage_coordinates_y))
+        (y - stage_coordinates_y[0]) / (phys_size_y or 1.0) for y in stage_coordinates_y
     ]
     relative_coordinates_z_px = [
-        (stage_coordinates_z[i] - stage_coordinates_z[0]) / (z_interval or 1.0)
-        for i in range(len(stage_coordinates_z))
+        (z - stage_coordinates_z[0]) / (z_interval or 1.0) for z in stage_coordinates_z
     ]
 
     return StageMetadata(
-        dimensions=dimensions,
+        dimensions=first["dimensions"],
         stage_coordinates_x=stage_coordinates_x,
         stage_coordinates_y=stage_coordinates_y,
         stage_coordinates_z=stage_coordinates_z,
         relative_coordinates_x=relative_coordinates_x_px,
         relative_coordinates_y=relative_coordinates_y_px,
         relative_coordinates_z=relative_coordinates_z_px,
-        image_calibration=image_calibration,
-        calibration_unit=calibration_unit,
-        image_dimensions_czt=image_dimensions_czt,
+        image_calibration=first["calibration"],
+        calibration_unit=first["calibration_unit"],
+        image_dimensions_czt=first["czt"],
         series_names=series_names,
         max_size=max_size,
     )
+
+
+def _stage_infos(filenames, use_cache, threads):
+    """Get the stage metadata of multiple files, optionally in parallel.
+
+    Parameters
+    ----------
+    filenames : list of str
+        List of image filepaths.
+    use_cache : bool
+        Whether to use the metadata catalogs, see `get_stage_coords()`.
+    threads : int
+        The number of worker threads to use, 1 for processing the files
+        sequentially in the calling thread.
+
+    Returns
+    -------
+    list of dict
+        The results of `_read_stage_info()` (or the catalog) for each file, in
+        the same order as `filenames`.
+    """
+
+    def process(position):
+        image = filenames[position]
+        first = position == 0
+        catalog = _get_catalog(image) if use_cache else None
+        info = catalog.get(image, "stage") if catalog is not None else None
+        # entries of files that weren't the first one lack the calibration:
+        if info is None or (first and "calibration" not in info):
+            info = _read_stage_info(image, first)
+            if catalog is not None:
+                _store_in_catalog(catalog, image, "stage", info)
+        return info
+
+    try:
+        return run_threaded(process, range(len(filenames)), threads)
+    finally:
+        if use_cache:
+            save_catalogs()
+        # don't keep the files open (and locked on Windows) after the batch:
+        for image in set(filenames):
+            close_readers(image)
+
+
+def get_stage_coords(filenames, use_cache=False, threads=1):
+    """Get stage coordinates and calibration for a given list of images.
+
+    Parameters
+    ----------
+    filenames : list of str
+        List of image filepaths.
+    use_cache : bool, optional
+        If set to True, the per-file metadata is taken from (or stored in) the
+        catalogs of the files' directories (see
+        `imcflibs.iotools.MetadataCatalog`), so Bio-Formats is only used for
+        files that are new or have changed. By default False.
+    threads : int, optional
+        The number of worker threads used to read the files in parallel (each
+        one using its own readers), by default 1. The results are identical to
+        the sequential processing, i.e. they are in the order of `filenames`
+        and the calibration is taken from the first file.
+
+    Returns
+    -------
+    StageMetadata
+        An object containing extracted stage metadata.
+    """
+    filenames = list(filenames)
+    infos = _stage_infos(filenames, use_cache, threads)
+    return _merge_stage_info(filenames, infos)
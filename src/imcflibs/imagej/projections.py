@@ -4,12 +4,21 @@ from ij.plugin import ZProjector  # pylint: disable-msg=E0401
 
 from .bioformats import export_using_orig_name  # pylint: disable-msg=E0401
 from ..log import LOG as log
+from ..pathtools import gen_name_from_orig
 
 from net.imagej.axis import Axes
 from net.imagej.ops import Ops
 from ij import ImagePlus, IJ
 from net.imagej import Dataset
 
+# projection types supported by `create_and_save()` and the corresponding
+# ZProjector method (also used as a tag for the result file names):
+PROJECTION_METHODS = {
+    "Average": "avg",
+    "Maximum": "max",
+    "Sum": "sum",
+}
+
 
 def average(imp):
     """Create an average intensity Z projection.
@@ -55,7 +64,16 @@ def maximum(imp):
     return proj
 
 
-def create_and_save(imp, projections, path, filename, export_format):
+def create_and_save(
+    imp,
+    projections,
+    path,
+    filename,
+    export_format,
+    cache=None,
+    inputs=None,
+    params=None,
+):
     """Create one or more projections and export (save) them.
 
     Parameters
@@ -71,6 +89,15 @@ def create_and_save(imp, projections, path, filename, export_format):
         The original file name to derive the results name from.
     export_format : str
         The suffix to be given to Bio-Formats, determining the storage format.
+    cache : imcflibs.iotools.ResultCache, optional
+        If given, projections that are up-to-date according to the cache will
+        be skipped, newly created ones will be recorded in it (without saving
+        the cache, use its `save()` method afterwards).
+    inputs : list(str), optional
+        The input files to check / record in the cache, by default
+        `[filename]`.
+    params : dict, optional
+        The processing parameters to check / record in the cache.
 
     Returns
     -------
@@ -86,21 +113,26 @@ def create_and_save(imp, projections, path, filename, export_format):
         log.error("ImagePlus is not a z-stack, not creating any projections!")
         return False
 
-    command = {
-        "Average": "avg",
-        "Maximum": "max",
-        "Sum": "sum",
-    }
+    inputs = inputs or [filename]
     for projection in projections:
+        method = PROJECTION_METHODS[projection]
+        if cache is not None:
+            target = gen_name_from_orig(path, filename, "-" + method, export_format)
+            if cache.is_current(target, inputs, params):
+                log.info("Found up-to-date projection, skipping: %s", target)
+                continue
         log.debug("Creating '%s' projection...", projection)
-        proj = ZProjector.run(imp, command[projection])
+        proj = ZProjector.run(imp, method)
         export_using_orig_name(
             proj,
             path,
             filename,
-            "-%s" % command[projection],
+            "-%s" % method,
             export_format,
             overwrite=True,
+            cache=cache,
+            inputs=inputs,
+            params=params,
         )
         proj.close()
 
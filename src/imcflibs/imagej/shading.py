@@ -1,5 +1,6 @@
 """Functions to work on shading correction / model generation."""
 
+import json
 import os
 
 import ij  # pylint: disable-msg=import-error
@@ -8,10 +9,24 @@ from ij.plugin import ImageCalculator
 from ij.process import StackStatistics
 from ..imagej import bioformats  # pylint: disable-msg=no-name-in-module
 from ..imagej import misc, projections
+from ..iotools import ResultCache
 from ..log import LOG as log
-from ..pathtools import gen_name_from_orig, listdir_matching
-
-
+from ..pathtools import (
+    create_directory,
+    exists,
+    gen_name_from_orig,
+    listdir_matching,
+    watch_matching,
+)
+from .._atomic import dump_json
+from .timing import timed
+
+# name of the file (in the output folder) to keep track of processed input files
+# when running `process_folder()` in watch mode:
+PROCESSED_FILES = "imcflibs-shading-processed.json"
+
+
+@timed
 def apply_model(imps, model, merge=True):
     """Apply a given shading model to a list of images / stacks.
 
@@ -55,7 +70,7 @@ def apply_model(imps, model, merge=True):
     return merged_imp
 
 
-def correct_and_project(filename, path, model, proj, fmt):
+def correct_and_project(filename, path, model, proj, fmt, cache=None, model_file=None):
     """Apply a shading correction to an image and create a projection.
 
     In case the target file for the shading corrected image already exists,
@@ -63,6 +78,12 @@ def correct_and_project(filename, path, model, proj, fmt):
     projections will be done (independent on whether the latter one already
     exist or not).
 
+    If a `cache` is given, existing results are only skipped if they are all
+    (the shading corrected image and the projections) still current, i.e. if
+    neither the input image, the model file nor the parameters have changed
+    since they were created. Otherwise they will be re-created. The cache is
+    saved once all results of the file have been created.
+
     Parameters
     ----------
     filename : str
@@ -79,6 +100,12 @@ def correct_and_project(filename, path, model, proj, fmt):
     fmt : str
         The file format suffix to be used for the results and projections, e.g.
         '.ics' for ICS2 etc. See the Bio-Formats specification for details.
+    cache : imcflibs.iotools.ResultCache, optional
+        The cache to check for (and record) up-to-date results, by default None
+        (meaning only the existence of the target file is checked).
+    model_file : str, optional
+        The path to the file `model` has been loaded from, used to detect
+        changes to the model when using a `cache`.
 
     Returns
     -------
@@ -88,39 +115,80 @@ def correct_and_project(filename, path, model, proj, fmt):
         both, the requested projections as well as the image type (e.g. it can
         be False even if projections were requested, but the image)
     """
-    target = gen_name_from_orig(path, filename, "", fmt)
-    if os.path.exists(target):
-        log.info("Found shading corrected file, not re-creating: %s", target)
-        return False, False
+    if proj == "None":
+        projs = []
+    elif proj == "ALL":
+        projs = ["Average", "Maximum"]
+    else:
+        projs = [proj]
 
-    if not os.path.exists(path):
-        os.makedirs(path)
+    inputs = [filename, model_file if model is not None else None]
+    params = {"proj": proj, "fmt": fmt}
+    target = gen_name_from_orig(path, filename, "", fmt)
+    if cache is None:
+        if exists(target):
+            log.info("Found shading corrected file, not re-creating: %s", target)
+            return False, False
+    else:
+        # check the projections in any case, a previous run might have been
+        # interrupted after creating the shading corrected image:
+        outputs = [
+            gen_name_from_orig(
+                path, filename, "-" + projections.PROJECTION_METHODS[x], fmt
+            )
+            for x in projs
+        ]
+        if model is not None:
+            outputs.insert(0, target)
+        if all(cache.is_current(x, inputs, params) for x in outputs):
+            log.info("Found up-to-date results, not re-creating: %s", filename)
+            return False, False
+
+    create_directory(path)
 
     imps = bioformats.import_image(filename, split_c=True)
     ret_corr = False
     if model is not None:
         log.debug("Applying shading correction on [%s]...", filename)
         imp = apply_model(imps, model)
-        bioformats.export_using_orig_name(imp, path, filename, "", fmt, True)
+        bioformats.export_using_orig_name(
+            imp,
+            path,
+            filename,
+            "",
+            fmt,
+            True,
+            cache=cache,
+            inputs=inputs,
+            params=params,
+        )
         # imps needs to be updated with the new (=merged) stack:
         imps = [imp]
         ret_corr = True
 
-    if proj == "None":
-        projs = []
-    elif proj == "ALL":
-        projs = ["Average", "Maximum"]
-    else:
-        projs = [proj]
     for imp in imps:
-        ret_proj = projections.create_and_save(imp, projs, path, filename, fmt)
+        ret_proj = projections.create_and_save(
+            imp, projs, path, filename, fmt, cache=cache, inputs=inputs, params=params
+        )
         imp.close()
 
+    if cache is not None:
+        cache.save()
     log.debug("Done processing [%s].", os.path.basename(filename))
     return ret_corr, ret_proj
 
 
-def process_folder(path, suffix, outpath, model_file, fmt):
+def process_folder(
+    path,
+    suffix,
+    outpath,
+    model_file,
+    fmt,
+    watch=False,
+    interval=10.0,
+    idle_timeout=600,
+    use_cache=False,
+):
     """Run shading correction and projections on an entire folder.
 
     Parameters
@@ -138,18 +206,103 @@ def process_folder(path, suffix, outpath, model_file, fmt):
         projection step will have an effect.
     fmt : str
         The file format suffix for storing the results.
+    watch : bool, optional
+        If set to True, the input folder is watched for new files (e.g. while
+        an acquisition is still running) using
+        `imcflibs.pathtools.watch_matching()`, processing each file as soon as
+        it is complete. Processed files are recorded in a file named as defined
+        in `PROCESSED_FILES` inside the output folder, so they will be skipped
+        when re-running the function. By default False.
+    interval : float, optional
+        The polling interval in seconds when running in watch mode.
+    idle_timeout : float, optional
+        The number of seconds without any new files after which watch mode will
+        stop, by default 600. Use None to watch forever.
+    use_cache : bool, optional
+        Passed on to `process_files()`, by default False.
+    """
+    if not watch:
+        matching_files = listdir_matching(path, suffix, fullpath=True)
+        process_files(matching_files, outpath, model_file, fmt, use_cache)
+        return
+
+    create_directory(outpath)
+    tracker = os.path.join(outpath, PROCESSED_FILES)
+    processed = _load_processed(tracker)
+    log.info("Watching [%s], %s files processed already.", path, len(processed))
+    incoming = watch_matching(
+        path,
+        suffix,
+        interval=interval,
+        idle_timeout=idle_timeout,
+        seen=set(processed),
+    )
+    process_files(
+        _record_processed(incoming, processed, tracker),
+        outpath,
+        model_file,
+        fmt,
+        use_cache,
+    )
+
+
+def _load_processed(tracker):
+    """Load the set of processed files from a tracking file.
+
+    Parameters
+    ----------
+    tracker : str
+        The path to the JSON file listing the processed files.
+
+    Returns
+    -------
+    set(str)
+        The full paths of the processed files, empty if the file doesn't exist
+        or is invalid (e.g. truncated by an interrupted run).
     """
-    matching_files = listdir_matching(path, suffix, fullpath=True)
-    process_files(matching_files, outpath, model_file, fmt)
+    if not os.path.exists(tracker):
+        return set()
+    try:
+        with open(tracker, "r") as fh:
+            return set(json.load(fh))
+    except ValueError as err:
+        log.warning("Ignoring invalid tracking file [%s]: %s", tracker, err)
+        return set()
 
 
-def process_files(files, outpath, model_file, fmt):
+def _record_processed(files, processed, tracker):
+    """Pass on files, recording each one in the tracking file once processed.
+
+    Parameters
+    ----------
+    files : iterable(str)
+        The files to be processed.
+    processed : set(str)
+        The files processed already, will be updated.
+    tracker : str
+        The path to the JSON file listing the processed files.
+
+    Yields
+    ------
+    str
+        The files from the input iterable.
+    """
+    for in_file in files:
+        yield in_file
+        # execution only resumes here once the consumer requests the next file,
+        # meaning the current one has been processed completely:
+        processed.add(in_file)
+        dump_json(sorted(processed), tracker)
+
+
+def process_files(files, outpath, model_file, fmt, use_cache=False):
     """Run shading correction and projections on a list of files.
 
     Parameters
     ----------
     files : list(str)
-        The files to be processed, as a list of strings with the full path.
+        The files to be processed, as a list of strings with the full path. Can
+        also be an iterable (e.g. a generator) providing them one by one.
     outpath : str
         The output folder where results will be stored. Existing files will be
         overwritten.
@@ -159,8 +312,18 @@ def process_files(files, outpath, model_file, fmt):
         projection step will have an effect.
     fmt : str
         The file format suffix for storing the results.
+    use_cache : bool, optional
+        If set to True, a `imcflibs.iotools.ResultCache` is kept in the output
+        folder to track the results. Existing results will then be re-created
+        if the corresponding input file or the shading model have changed
+        instead of being skipped unconditionally. By default False.
     """
-    log.info("Running shading correction and projections on %s files...", len(files))
+    try:
+        log.info(
+            "Running shading correction and projections on %s files...", len(files)
+        )
+    except TypeError:
+        log.info("Running shading correction and projections on incoming files...")
 
     if model_file.upper() in ["-", "NONE"]:
         model = None
@@ -176,8 +339,15 @@ def process_files(files, outpath, model_file, fmt):
         except AttributeError:
             misc.error_exit("Opening shading model [%s] failed!" % model_file)
 
+    cache = None
+    if use_cache:
+        create_directory(outpath)
+        cache = ResultCache(outpath)
+
     for in_file in files:
-        correct_and_project(in_file, outpath, model, "ALL", fmt)
+        correct_and_project(
+            in_file, outpath, model, "ALL", fmt, cache=cache, model_file=model_file
+        )
 
     if model:
         model.close()
@@ -1,5 +1,6 @@
 """Functions to work on stitching datasets."""
 
+import logging
 from os.path import join
 
 from java.lang.System import getProperty  # pylint: disable-msg=import-error
@@ -105,9 +106,11 @@ def gen_macro(mosaics, indir, outfile=None, opts=None):
         opts=stitcher_options,
     )
 
-    log.debug("============= begin of generated macro code =============")
-    log.debug(flatten(code))
-    log.debug("============= end of generated  macro code =============")
+    # only assemble the code for logging if it will actually be logged:
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("============= begin of generated macro code =============")
+        log.debug(flatten(code))
+        log.debug("============= end of generated  macro code =============")
 
     if outfile is not None:
         log.info("Writing stitching macro.")
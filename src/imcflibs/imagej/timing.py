@@ -0,0 +1,220 @@
+"""Functions to record the time (and memory) spent in named processing stages.
+
+The statistics are kept on module level, and Fiji keeps modules loaded between
+script runs. Scripts should therefore call `reset_stage_stats()` when they
+start, otherwise the stats of previous runs are included in their report.
+
+Example
+-------
+Stages can be timed using a context manager or by decorating a function:
+
+>>> from imcflibs.imagej import timing
+>>> timing.reset_stage_stats()
+>>> @timing.timed
+... def segment(imp):
+...     pass
+>>> with timing.timed_stage("segmentation"):
+...     segment(imp)
+
+At the end of a run, the collected statistics can be logged or saved:
+
+>>> log.info(timing.format_stage_stats())
+>>> timing.dump_stage_stats("/data/results/timing.csv")
+"""
+
+import csv
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from ..log import LOG as log
+
+# column names of the statistics, in the order used for reports:
+STAGE_FIELDS = [
+    "stage",
+    "calls",
+    "total_time",
+    "mean_time",
+    "min_time",
+    "max_time",
+    "free_mem_before",
+    "free_mem_after",
+    "min_free_mem",
+]
+
+_STAGES = OrderedDict()
+_STAGES_LOCK = threading.Lock()
+
+
+def _free_memory():
+    """Get the free memory available to ImageJ.
+
+    The `misc` module is imported here as it depends on `bioformats`, which in
+    turn is using this module.
+
+    Returns
+    -------
+    int or None
+        The free memory in bytes, None if it can't be determined (e.g. when not
+        running in ImageJ), so timing never breaks the timed code.
+    """
+    from . import misc  # pylint: disable-msg=import-outside-toplevel
+
+    try:
+        return misc.get_free_memory()
+    except AttributeError:
+        return None
+
+
+def _record(name, elapsed, mem_before, mem_after):
+    """Add a single call of a stage to the statistics."""
+    mem_values = [x for x in (mem_before, mem_after) if x is not None]
+    with _STAGES_LOCK:
+        stats = _STAGES.get(name)
+        if stats is None:
+            stats = _STAGES[name] = {
+                "calls": 0,
+                "total_time": 0.0,
+                "min_time": elapsed,
+                "max_time": elapsed,
+                "min_free_mem": None,
+            }
+        stats["calls"] += 1
+        stats["total_time"] += elapsed
+        stats["min_time"] = min(stats["min_time"], elapsed)
+        stats["max_time"] = max(stats["max_time"], elapsed)
+        stats["free_mem_before"] = mem_before
+        stats["free_mem_after"] = mem_after
+        if stats["min_free_mem"] is not None:
+            mem_values.append(stats["min_free_mem"])
+        if mem_values:
+            stats["min_free_mem"] = min(mem_values)
+
+
+@contextmanager
+def timed_stage(name):
+    """Record the wall time and free memory of a stage (context manager).
+
+    Every execution of the enclosed block counts as one call of the stage with
+    the given name, see `get_stage_stats()` for the recorded values. The call is
+    also recorded if the block raises an exception.
+
+    Parameters
+    ----------
+    name : str
+        The name of the stage.
+    """
+    mem_before = _free_memory()
+    start = time.time()
+    try:
+        yield
+    finally:
+        elapsed = time.time() - start
+        mem_after = _free_memory()
+        _record(name, elapsed, mem_before, mem_after)
+        log.debug("Stage [%s] took %.3fs.", name, elapsed)
+
+
+def timed(func):
+    """Record each call of a function as a stage (decorator).
+
+    The stage is named after the function, prefixed with the (last part of the)
+    name of its module, e.g. `bioformats.import_image`.
+
+    Parameters
+    ----------
+    func : callable
+        The function to be timed.
+
+    Returns
+    -------
+    callable
+    """
+    name = "%s.%s" % (func.__module__.rsplit(".", 1)[-1], func.__name__)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with timed_stage(name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def get_stage_stats():
+    """Get the statistics of all stages recorded so far.
+
+    Returns
+    -------
+    list(dict)
+        One dict per stage (in the order they were first recorded) having the
+        keys listed in `STAGE_FIELDS`. Times are given in seconds, memory values
+        in bytes (`free_mem_before` and `free_mem_after` refer to the last call
+        of the stage, memory values are None if they couldn't be determined).
+    """
+    result = []
+    with _STAGES_LOCK:
+        for name, stats in _STAGES.items():
+            row = dict(stats, stage=name)
+            row["mean_time"] = stats["total_time"] / stats["calls"]
+            result.append(row)
+    return result
+
+
+def reset_stage_stats():
+    """Discard all statistics recorded so far.
+
+    To be called at the start of a script, as the statistics of previous runs
+    are kept as long as Fiji is running.
+    """
+    with _STAGES_LOCK:
+        _STAGES.clear()
+
+
+def format_stage_stats():
+    """Format the statistics of all stages as a table, e.g. for logging.
+
+    Returns
+    -------
+    str
+    """
+    lines = ["%-45s %6s %10s %10s %10s" % ("stage", "calls", "total", "mean", "max")]
+    for row in get_stage_stats():
+        lines.append(
+            "%-45s %6d %9.2fs %9.3fs %9.3fs"
+            % (
+                row["stage"],
+                row["calls"],
+                row["total_time"],
+                row["mean_time"],
+                row["max_time"],
+            )
+        )
+    return "\n".join(lines)
+
+
+def dump_stage_stats(fname):
+    """Save the statistics of all stages to a CSV or JSON file.
+
+    Parameters
+    ----------
+    fname : str
+        The output file name, a file ending in `.json` will be written as JSON,
+        anything else as CSV. Existing files will be overwritten.
+    """
+    rows = get_stage_stats()
+    if str(fname).lower().endswith(".json"):
+        with open(fname, "w") as out:
+            json.dump(
+                [OrderedDict((x, row[x]) for x in STAGE_FIELDS) for row in rows],
+                out,
+                indent=2,
+            )
+        return
+
+    with open(fname, "w") as out:
+        writer = csv.DictWriter(out, fieldnames=STAGE_FIELDS, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
@@ -19,6 +19,7 @@ from ij import IJ
 from java.lang import Double
 
 from .. import pathtools
+from .timing import timed
 
 
 def cellpose_detector(
@@ -299,6 +300,7 @@ def track_filtering(
     return settings
 
 
+@timed
 def run_trackmate(
     implus,
     settings,
@@ -1,12 +1,19 @@
 """I/O related functions."""
 
+import gzip
+import json
+import os
+import threading
 import zipfile
 
+from collections import OrderedDict
 from os.path import splitext, join
 
 from .log import LOG as log
+from .pathtools import exists, file_identity
 from .strtools import flatten
 
+from ._atomic import dump_json
 from ._jython_compat import file_types
 
 
@@ -61,15 +68,205 @@ def filehandle(fname, mode="r"):
         raise SystemExit(message % type(fname))
 
 
+class _ArchivePool(object):
+    """A bounded pool of open `zipfile.ZipFile` handles.
+
+    Handles are keyed by the absolute path of the archive and re-opened if the
+    modification time of the archive has changed. If the pool is full, the
+    least recently used handle is closed.
+
+    Parameters
+    ----------
+    size : int, optional
+        The maximum number of handles to keep open, by default 8.
+    """
+
+    def __init__(self, size=8):
+        self.size = size
+        self._handles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """Get an open handle for an archive, re-using a pooled one if possible.
+
+        Parameters
+        ----------
+        path : str
+            The path to the `.zip` or `.jar` archive.
+
+        Returns
+        -------
+        zipfile.ZipFile
+            The (shared) handle, which must *NOT* be closed by the caller.
+        """
+        key = os.path.abspath(path)
+        mtime = os.stat(key).st_mtime
+        with self._lock:
+            cached = self._handles.pop(key, None)
+            if cached is not None and cached[0] != mtime:
+                log.debug("Archive has been modified, re-opening: %s", key)
+                cached[1].close()
+                cached = None
+            if cached is None:
+                cached = (mtime, zipfile.ZipFile(key, "r"))
+                while len(self._handles) >= self.size:
+                    _, (_, evicted) = self._handles.popitem(last=False)
+                    evicted.close()
+            # (re-)insert to mark the entry as being the most recently used one:
+            self._handles[key] = cached
+        return cached[1]
+
+    def close(self, path=None):
+        """Close pooled handles, either the one of a given archive or all.
+
+        Parameters
+        ----------
+        path : str, optional
+            The archive whose handle should be closed. If omitted, all handles
+            in the pool will be closed.
+        """
+        with self._lock:
+            if path is None:
+                handles = list(self._handles.values())
+                self._handles.clear()
+            else:
+                cached = self._handles.pop(os.path.abspath(path), None)
+                handles = [cached] if cached is not None else []
+        for _, handle in handles:
+            handle.close()
+
+
+_ARCHIVES = _ArchivePool()
+
+
+def open_archive(path):
+    """Get an open handle to a `.zip` / `.jar` archive from a shared pool.
+
+    Reading multiple files from the same archive (e.g. templates from a jar in
+    Fiji) doesn't require re-opening the archive and re-parsing its directory
+    for every single file that way. Handles are automatically re-opened if the
+    archive has been modified.
+
+    Parameters
+    ----------
+    path : str
+        The path to the archive.
+
+    Returns
+    -------
+    zipfile.ZipFile
+        The pooled handle, which must *NOT* be closed by the caller (use
+        `close_archives()` instead).
+    """
+    return _ARCHIVES.get(path)
+
+
+def close_archives(path=None):
+    """Close pooled archive handles (see `open_archive()`).
+
+    Parameters
+    ----------
+    path : str, optional
+        The archive whose handle should be closed. If omitted, all pooled
+        handles will be closed.
+    """
+    _ARCHIVES.close(path)
+
+
+def _open_text(fname, path=""):
+    """Open a text file for reading, either plainly, compressed or from an archive.
+
+    Parameters
+    ----------
+    fname : str
+        The name of the file to open, see `readtxt()` for details.
+    path : str (optional)
+        The directory or archive (`.zip` / `.jar`) containing the file.
+
+    Returns
+    -------
+    filehandle
+        The handle to read from, to be closed by the caller. Archives are kept
+        open in the pool managed by `open_archive()`.
+    """
+    suffix = splitext(path)[1].lower()
+    if (suffix == ".zip") or (suffix == ".jar"):
+        return open_archive(path).open(fname)
+
+    fullpath = join(path, fname)
+    suffix = splitext(fullpath)[1].lower()
+    if suffix == ".gz":
+        return gzip.open(fullpath, "rb")
+    if suffix == ".bz2":
+        # only import on demand, bz2 might not be available on all platforms
+        import bz2
+
+        return bz2.BZ2File(fullpath, "r")
+    return open(fullpath, "r")
+
+
+def iter_lines(fname, path="", chunk_size=None):
+    """Iterate over the lines of a text file, plain, compressed or zipped.
+
+    This is the streaming counterpart of `readtxt()`: lines are read and
+    yielded one by one (or in chunks of a given number of lines), so memory
+    usage stays constant independent of the file size. Files having a `.gz` or
+    `.bz2` suffix are transparently decompressed.
+
+    Parameters
+    ----------
+    fname : str
+        The name of the file to read in. Can be a full or relative path if
+        desired. For automatic archive handling use the 'path' parameter.
+    path : str (optional)
+        The directory where to look for the file. If the string has the suffix
+        '.zip' or '.jar' an archive is assumed and the corresponding mechanisms
+        are used to read 'fname' from within this archive.
+    chunk_size : int (optional)
+        If given, lists of (up to) this number of lines are yielded instead of
+        individual lines.
+
+    Yields
+    ------
+    str or list(str)
+        The lines of the file (including line endings), one by one or in lists
+        of `chunk_size` lines.
+
+    Example
+    -------
+    >>> for line in iter_lines("MATL_Mosaic.log", "/data/mosaic"):
+    ...     parse(line)
+    ... # doctest: +SKIP
+    """
+    fin = _open_text(fname, path)
+    chunk = []
+    try:
+        for line in fin:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            if chunk_size is None:
+                yield line
+                continue
+            chunk.append(line)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        fin.close()
+
+
 def readtxt(fname, path="", flat=False):
     """Commodity function for reading text files plain or zipped.
 
-    Read a text file line by line either plainly from a directory or a .zip or
-    .jar file. Return as a list of strings or optionally flattened into a
-    single string.
+    Read a text file line by line either plainly from a directory, from a
+    gzip / bzip2 compressed file or from a .zip or .jar file. Return as a list
+    of strings or optionally flattened into a single string.
 
     BEWARE: this is NOT intended for HUGE text files as it actually reads them
-    in and returns the content, not a handle to the reader itself!
+    in and returns the content, not a handle to the reader itself! Use
+    `iter_lines()` for processing large files.
 
     Parameters
     ----------
@@ -92,23 +289,317 @@ def readtxt(fname, path="", flat=False):
     >>> readtxt('foo', '/tmp/archive.zip', flat=True)
     ... # doctest: +SKIP
     """
-    zipread = None
-    suffix = splitext(path)[1].lower()
-    if (suffix == ".zip") or (suffix == ".jar"):
-        # ZipFile only works as a context manager from Python 2.7 on
-        # tag:python25
-        zipread = zipfile.ZipFile(path, "r")
-        fin = zipread.open(fname)
-    else:
-        fin = open(join(path, fname), "r")
-    txt = fin.readlines()  # returns file as a list, one entry per line
+    # read all lines at once, iterating over `iter_lines()` is a lot slower:
+    fin = _open_text(fname, path)
     try:
+        txt = fin.readlines()
+    finally:
+        fin.close()
+    if txt and isinstance(txt[0], bytes):
         txt = [x.decode("utf-8") for x in txt]
-    except AttributeError:
-        pass  # in Python2 decoding isn't necessary
     if flat:
         txt = flatten(txt)
-    fin.close()
-    if zipread is not None:
-        zipread.close()
     return txt
+
+
+def writetxt(chunks, fname, mode="w"):
+    r"""Write strings to a file one by one, without assembling them first.
+
+    This is the counterpart of `readtxt()` / `iter_lines()`: the given chunks
+    (e.g. the lines of a generated macro) are sent straight to the file handle,
+    so no intermediate (flattened) copy of the content is created.
+
+    Parameters
+    ----------
+    chunks : iterable(str)
+        The strings to be written, including line endings (if desired). Can be
+        any iterable, including generators.
+    fname : str or filehandle
+        The file to write to. If a filehandle is given, it needs to have the
+        matching mode and will not be closed by this function.
+    mode : str, optional
+        The mode for opening the file, by default "w" (use "a" to append).
+
+    Returns
+    -------
+    int
+        The total number of characters written.
+
+    Example
+    -------
+    >>> writetxt(("line %s\n" % i for i in range(3)), "/tmp/lines.txt")
+    ... # doctest: +SKIP
+    """
+    fout = filehandle(fname, mode)
+    written = 0
+    try:
+        for chunk in chunks:
+            fout.write(chunk)
+            written += len(chunk)
+    finally:
+        if fout is not fname:
+            fout.close()
+    return written
+
+
+# default name of the manifest file used by `ResultCache`:
+RESULT_MANIFEST = "imcflibs-results.json"
+
+
+class ResultCache(object):
+    """Track results in an output folder to skip re-computing unchanged ones.
+
+    For every result file, the identity of the input files (see
+    `imcflibs.pathtools.file_identity()`) and the processing parameters are
+    recorded in a JSON manifest inside the output folder. A result is only
+    considered being current if it exists and both, the inputs and parameters,
+    are the same as they were when it has been recorded.
+
+    Parameters
+    ----------
+    folder : str
+        The output folder, also used to store the manifest.
+    hash_bytes : int, optional
+        Passed on to `imcflibs.pathtools.file_identity()`, by default 0.
+    manifest : str, optional
+        The file name of the manifest, by default `RESULT_MANIFEST`.
+
+    Example
+    -------
+    >>> cache = ResultCache("/data/results")
+    >>> params = {"sigma": 2.0}
+    >>> if not cache.is_current(out_file, [in_file], params):
+    ...     process(in_file, out_file, params)
+    ...     cache.record(out_file, [in_file], params, save=False)
+    >>> cache.save()
+    ... # doctest: +SKIP
+    """
+
+    def __init__(self, folder, hash_bytes=0, manifest=RESULT_MANIFEST):
+        self.folder = str(folder)
+        self.manifest = join(self.folder, manifest)
+        self.hash_bytes = hash_bytes
+        self._entries = {}
+        self._lock = threading.Lock()
+        if not os.path.isfile(self.manifest):
+            return
+        try:
+            with open(self.manifest, "r") as fh:
+                self._entries = json.load(fh)
+        except ValueError as err:
+            log.warning("Ignoring invalid manifest [%s]: %s", self.manifest, err)
+
+    def _key(self, output):
+        """Get the manifest key for a result file (relative to the folder)."""
+        return os.path.relpath(str(output), self.folder)
+
+    def fingerprint(self, inputs, params=None):
+        """Generate the fingerprint for a set of inputs and parameters.
+
+        Parameters
+        ----------
+        inputs : list(str)
+            The input files, entries being None are ignored.
+        params : dict, optional
+            The processing parameters, have to be JSON-serializable.
+
+        Returns
+        -------
+        dict
+        """
+        return {
+            "inputs": [
+                [str(x), file_identity(x, self.hash_bytes)] for x in inputs if x
+            ],
+            # do a JSON round-trip to compare exactly what will be stored:
+            "params": json.loads(json.dumps(params or {})),
+        }
+
+    def is_current(self, output, inputs, params=None):
+        """Check if a result exists and is up-to-date.
+
+        Parameters
+        ----------
+        output : str
+            The result file.
+        inputs : list(str)
+            The input files the result has been computed from.
+        params : dict, optional
+            The processing parameters used to compute the result.
+
+        Returns
+        -------
+        bool
+        """
+        entry = self._entries.get(self._key(output))
+        if entry is None or not exists(str(output)):
+            return False
+        try:
+            current = self.fingerprint(inputs, params)
+        except OSError:  # at least one of the inputs doesn't exist (any more)
+            return False
+        if entry != current:
+            log.debug("Inputs or parameters have changed for [%s].", output)
+            return False
+        return True
+
+    def record(self, output, inputs, params=None, save=True):
+        """Record a result.
+
+        Parameters
+        ----------
+        output : str
+            The result file.
+        inputs : list(str)
+            The input files the result has been computed from.
+        params : dict, optional
+            The processing parameters used to compute the result.
+        save : bool, optional
+            Whether to save the manifest right away, by default True. Use False
+            for recording many results, followed by a call to `save()`.
+        """
+        fingerprint = self.fingerprint(inputs, params)
+        with self._lock:
+            self._entries[self._key(output)] = fingerprint
+        if save:
+            self.save()
+
+    def save(self):
+        """Save the manifest.
+
+        The manifest is written to a temporary file first, so an interrupted
+        run never leaves a truncated manifest behind. Failing to write it (e.g.
+        to a read-only share) is logged as a warning but doesn't raise an
+        exception, results will just be re-computed on the next run.
+        """
+        with self._lock:
+            try:
+                dump_json(self._entries, self.manifest, indent=1, sort_keys=True)
+            except (IOError, OSError) as err:
+                log.warning("Unable to save manifest [%s]: %s", self.manifest, err)
+
+
+# default name of the catalog file used by `MetadataCatalog`:
+METADATA_CATALOG = "imcflibs-metadata.json"
+
+
+class MetadataCatalog(object):
+    """A JSON catalog storing metadata of the files in a directory.
+
+    The catalog is stored as a sidecar file in the directory itself. Entries are
+    organized in sections (e.g. one per type of metadata) and are keyed by the
+    file name, together with the size and modification time of the file (see
+    `imcflibs.pathtools.file_identity()`). Entries of files that have changed
+    are ignored (and replaced when setting new values), so invalidation happens
+    automatically.
+
+    Parameters
+    ----------
+    directory : str
+        The directory containing the files, also used to store the catalog.
+    catalog : str, optional
+        The file name of the catalog, by default `METADATA_CATALOG`.
+
+    Example
+    -------
+    >>> catalog = MetadataCatalog("/data/raw")
+    >>> meta = catalog.get("/data/raw/image_01.czi", "image")
+    >>> if meta is None:
+    ...     meta = extract_metadata("/data/raw/image_01.czi")
+    ...     catalog.set("/data/raw/image_01.czi", "image", meta)
+    ... # doctest: +SKIP
+    """
+
+    _VERSION = 1
+
+    def __init__(self, directory, catalog=METADATA_CATALOG):
+        self.directory = str(directory)
+        self.catalog = join(self.directory, catalog)
+        # whether there are changes that haven't been saved yet:
+        self.modified = False
+        self._files = {}
+        self._lock = threading.Lock()
+        if not os.path.isfile(self.catalog):
+            return
+        try:
+            with open(self.catalog, "r") as fh:
+                content = json.load(fh)
+        except ValueError as err:
+            log.warning("Ignoring invalid catalog [%s]: %s", self.catalog, err)
+            return
+        if content.get("version") == self._VERSION:
+            self._files = content["files"]
+
+    def get(self, path, section):
+        """Get the metadata of a file, if present and up-to-date.
+
+        Parameters
+        ----------
+        path : str
+            The file (inside the catalog's directory).
+        section : str
+            The section of the catalog, e.g. the type of metadata.
+
+        Returns
+        -------
+        dict or None
+            The stored metadata, None if the catalog has no entry for the file
+            (in the given section) or the file has changed since it was stored.
+        """
+        entry = self._files.get(os.path.basename(str(path)))
+        if entry is None or section not in entry:
+            return None
+        try:
+            identity = file_identity(path)
+        except OSError:
+            return None
+        if identity != entry["identity"]:
+            log.debug("File has changed, ignoring cached metadata: %s", path)
+            return None
+        return entry[section]
+
+    def set(self, path, section, data, save=True):
+        """Store the metadata of a file.
+
+        Parameters
+        ----------
+        path : str
+            The file (inside the catalog's directory).
+        section : str
+            The section of the catalog, e.g. the type of metadata.
+        data : dict
+            The metadata, has to be JSON-serializable.
+        save : bool, optional
+            Whether to save the catalog right away, by default True. Use False
+            for storing metadata of many files, followed by a call to `save()`.
+        """
+        name = os.path.basename(str(path))
+        identity = file_identity(path)
+        with self._lock:
+            entry = self._files.get(name)
+            if entry is None or entry["identity"] != identity:
+                entry = self._files[name] = {"identity": identity}
+            entry[section] = data
+            self.modified = True
+        if save:
+            self.save()
+
+    def save(self):
+        """Save the catalog.
+
+        The catalog is written to a temporary file first, so an interrupted run
+        never leaves a truncated catalog behind. Failing to write it (e.g. to a
+        read-only share) is logged as a warning but doesn't raise an exception,
+        the catalog is just a cache.
+        """
+        with self._lock:
+            try:
+                dump_json(
+                    {"version": self._VERSION, "files": self._files},
+                    self.catalog,
+                    separators=(",", ":"),
+                    sort_keys=True,
+                )
+                self.modified = False
+            except (IOError, OSError) as err:
+                log.warning("Unable to save catalog [%s]: %s", self.catalog, err)
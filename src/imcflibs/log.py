@@ -17,14 +17,155 @@ The logging levels, in increasing order of importance, are:
 30 WARN
 40 ERROR
 50 CRITICAL
+
+To keep logging from slowing down processing loops, the handlers can be moved
+to a background thread by calling `enable_queue_logging()`.
 """
 
 
+import atexit
 import logging
+import threading
+
+from ._jython_compat import queue
 
 
 LOG = logging.getLogger(__name__)
 
+# the listener thread running the handlers and the handler feeding its queue, if
+# queue logging is enabled:
+_LISTENER = None
+_QUEUE_HANDLER = None
+
+
+class _QueueHandler(logging.Handler):
+    """Logging handler putting records into a bounded queue.
+
+    If the queue is full, records of level DEBUG (or lower) are dropped while
+    all others block until there is space again, so no important messages are
+    lost.
+    """
+
+    def __init__(self, record_queue):
+        logging.Handler.__init__(self)
+        self.queue = record_queue
+        self.dropped = 0
+
+    def prepare(self, record):
+        """Merge the message and arguments and pre-format any exception.
+
+        The record is formatted in the calling thread as the arguments might be
+        changed (or not be thread-safe) by the time the listener handles it.
+        """
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        """Put a record into the queue, dropping it if full and DEBUG."""
+        try:
+            record = self.prepare(record)
+            if record.levelno > logging.DEBUG:
+                self.queue.put(record)
+                return
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self.dropped += 1
+        except Exception:  # pylint: disable-msg=broad-except
+            self.handleError(record)
+
+
+class _BatchedFileHandler(logging.FileHandler):
+    """File handler that only flushes when being told so.
+
+    A plain `logging.FileHandler` flushes its stream after every record, this
+    one leaves it to `_QueueListener` to flush once per batch of records. While
+    queue logging is not enabled (`batched` being False), it flushes after
+    every record like a plain one.
+    """
+
+    batched = True
+
+    def flush(self):
+        """Flush the stream unless batched, see `flush_batch()`."""
+        if not self.batched:
+            logging.FileHandler.flush(self)
+
+    def flush_batch(self):
+        """Flush the stream."""
+        logging.FileHandler.flush(self)
+
+
+class _QueueListener(threading.Thread):
+    """Background thread passing queued records on to the actual handlers.
+
+    Parameters
+    ----------
+    record_queue : queue.Queue
+        The queue to take the log records from.
+    handlers : list(logging.Handler)
+        The handlers to dispatch the records to.
+    batch_size : int
+        The maximum number of records to handle before flushing the handlers.
+    """
+
+    _STOP = None
+
+    def __init__(self, record_queue, handlers, batch_size):
+        threading.Thread.__init__(self, name="imcflibs-log")
+        self.daemon = True
+        self.queue = record_queue
+        self.handlers = list(handlers)
+        self.batch_size = batch_size
+
+    def _dispatch(self, record):
+        """Pass a record on to all handlers having a matching level."""
+        for handler in list(self.handlers):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _flush(self):
+        """Flush all handlers (once per batch)."""
+        for handler in list(self.handlers):
+            if isinstance(handler, _BatchedFileHandler):
+                handler.flush_batch()
+            else:
+                handler.flush()
+
+    def run(self):
+        """Handle records in batches until the stop sentinel is received."""
+        stop = False
+        while not stop:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for record in batch:
+                if record is self._STOP:
+                    stop = True
+                else:
+                    self._dispatch(record)
+            self._flush()
+
+    def stop(self):
+        """Handle all pending records, then stop the thread and wait for it."""
+        self.queue.put(self._STOP)
+        self.join()
+
+
+def _add_handler(handler):
+    """Add a handler to the logger or the listener if queue logging is active."""
+    if _LISTENER is not None:
+        _LISTENER.handlers.append(handler)
+    else:
+        LOG.addHandler(handler)
+
 
 def enable_console_logging():
     """Add a stream handler logging to the console.
@@ -34,22 +175,98 @@ def enable_console_logging():
     logging.StreamHandler
     """
     stream_handler = logging.StreamHandler()
-    LOG.addHandler(stream_handler)
+    _add_handler(stream_handler)
     return stream_handler
 
 
 def enable_file_logging(fname, mode="a"):
     """Add a logging handler writing to a file.
 
+    While queue logging is enabled (no matter if this function is called before
+    or after `enable_queue_logging()`), the file will only be flushed once per
+    batch of records instead of after every single record.
+
     Returns
     -------
     logging.FileHandler
     """
-    file_handler = logging.FileHandler(fname, mode=mode)
-    LOG.addHandler(file_handler)
+    file_handler = _BatchedFileHandler(fname, mode=mode)
+    file_handler.batched = _LISTENER is not None
+    _add_handler(file_handler)
     return file_handler
 
 
+def enable_queue_logging(maxsize=10000, batch_size=100):
+    """Run all log handlers on a background thread.
+
+    The handlers currently attached to the logger (and all the ones added later
+    through `enable_console_logging()` and `enable_file_logging()`) are moved
+    behind a bounded queue, so a logging call only needs to put the record into
+    that queue instead of doing the (synchronous) I/O itself. The handlers are
+    flushed once per batch of records (file handlers not created through
+    `enable_file_logging()` still flush after every record, but do so in the
+    background thread as well). If the queue is full (e.g. in case of a
+    flood of debug messages), DEBUG records are dropped while records of any
+    other level will wait for the queue to drain.
+
+    Pending records are handled when calling `disable_queue_logging()`, which is
+    also done automatically when the interpreter exits.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        The maximum number of records in the queue, by default 10000.
+    batch_size : int, optional
+        The maximum number of records handled between flushes, by default 100.
+
+    Returns
+    -------
+    _QueueHandler
+        The handler attached to the logger (its `dropped` attribute holds the
+        number of dropped DEBUG records).
+    """
+    global _LISTENER, _QUEUE_HANDLER  # pylint: disable-msg=global-statement
+    if _LISTENER is not None:
+        return _QUEUE_HANDLER
+
+    record_queue = queue.Queue(maxsize)
+    handlers = list(LOG.handlers)
+    for handler in handlers:
+        LOG.removeHandler(handler)
+        if isinstance(handler, _BatchedFileHandler):
+            handler.batched = True
+    _LISTENER = _QueueListener(record_queue, handlers, batch_size)
+    _LISTENER.start()
+    _QUEUE_HANDLER = _QueueHandler(record_queue)
+    LOG.addHandler(_QUEUE_HANDLER)
+    return _QUEUE_HANDLER
+
+
+def disable_queue_logging():
+    """Handle all pending records and run the log handlers synchronously again.
+
+    Does nothing if queue logging is not enabled.
+    """
+    global _LISTENER, _QUEUE_HANDLER  # pylint: disable-msg=global-statement
+    if _LISTENER is None:
+        return
+
+    LOG.removeHandler(_QUEUE_HANDLER)
+    _LISTENER.stop()
+    for handler in _LISTENER.handlers:
+        if isinstance(handler, _BatchedFileHandler):
+            handler.batched = False
+        LOG.addHandler(handler)
+    dropped = _QUEUE_HANDLER.dropped
+    _LISTENER = None
+    _QUEUE_HANDLER = None
+    if dropped:
+        LOG.warning("Dropped %s DEBUG log records.", dropped)
+
+
+atexit.register(disable_queue_logging)
+
+
 def set_loglevel(verbosity):
     """Calculate the default loglevel and set it accordingly.
 
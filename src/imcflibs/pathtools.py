@@ -1,14 +1,149 @@
 """Helper functions to work with filenames, directories etc."""
 
+import errno
+import hashlib
+import json
+import os
 import os.path
 import platform
 import re
+import stat
+import threading
+import time
+from collections import OrderedDict
+from operator import itemgetter
 from os import sep
 
 from . import strtools
+from ._atomic import dump_json
+from ._threads import run_threaded
 from .log import LOG as log
 
 
+def _split_image_ext(fname):
+    """Split a file name into basename and extension, respecting OME-TIFF.
+
+    Parameters
+    ----------
+    fname : str
+        The file name (without any path components).
+
+    Returns
+    -------
+    (str, str)
+        The basename and the extension, where a composite suffix like `.ome.tif`
+        or `.ome.tiff` is considered being the extension.
+    """
+    base, ext = os.path.splitext(fname)
+    if base.lower().endswith(".ome") and ext.lower().startswith(".tif"):
+        return base[:-4], base[-4:] + ext
+    return base, ext
+
+
+def _components(orig):
+    """Split a path into all components described in `parse_path()`.
+
+    Parameters
+    ----------
+    orig : str
+        The path (already combined with the prefix, if any).
+
+    Returns
+    -------
+    dict
+    """
+    full = orig.replace("\\", sep)
+    folder, fname = os.path.split(full)
+    parent, dname = os.path.split(folder)
+    basename, ext = _split_image_ext(fname)
+    return {
+        "orig": orig,
+        "full": full,
+        "parent": parent,
+        "path": folder + sep,
+        "dname": dname,
+        "fname": fname,
+        "basename": basename,
+        "ext": ext,
+    }
+
+
+def _join_prefix(path, prefix):
+    """Prefix a path with another path component (if given).
+
+    Parameters
+    ----------
+    path : str
+        The path to be prefixed.
+    prefix : str
+        The prefix, may be empty.
+
+    Returns
+    -------
+    str
+    """
+    if not prefix:
+        return path
+    # remove leading slash, otherwise join() will discard the first path:
+    if path.startswith("/"):
+        path = path[1:]
+    return os.path.join(prefix, path)
+
+
+def _component(key, doc):
+    """Create a read-only property for a component of a `ParsedPath`."""
+    return property(itemgetter(key), doc=doc)
+
+
+class ParsedPath(dict):
+    """Result of `parse_path()`, a `dict` also providing attribute access.
+
+    The components of the path can be accessed either using their keys (e.g.
+    `parsed["basename"]`) or as attributes (e.g. `parsed.basename`), see
+    `parse_path()` for details. Every call to `parse_path()` returns a new
+    object, so it can be modified like any other dict.
+    """
+
+    __slots__ = ()
+
+    _KEYS = ("orig", "full", "parent", "path", "dname", "fname", "basename", "ext")
+
+    orig = _component(
+        "orig", "The full string as passed in (possibly combined with the prefix)."
+    )
+    full = _component(
+        "full", "The same as `orig` with separators adjusted to the current platform."
+    )
+    parent = _component("parent", "The parent folder of the selected file.")
+    path = _component(
+        "path", "The same as `full`, up to (including) the last separator."
+    )
+    dname = _component(
+        "dname", "The segment between the last two separators (directory)."
+    )
+    fname = _component("fname", "The segment after the last separator (filename).")
+    basename = _component("basename", "The filename without extension.")
+    ext = _component("ext", "The filename extension (including the dot).")
+
+    def to_dict(self):
+        """Convert the parsed path to a plain dict.
+
+        Returns
+        -------
+        dict
+        """
+        return dict(self)
+
+
+# bounded cache for the components computed by parse_path(), keyed on the path
+# (or a tuple of path and prefix), that is simply cleared once it is full -
+# lookups are done without the lock, as reading from a dict is atomic (in
+# C-Python and Jython):
+_PARSE_CACHE = {}
+_PARSE_CACHE_SIZE = 4096
+_PARSE_CACHE_LOCK = threading.Lock()
+
+
 def parse_path(path, prefix=""):
     r"""Parse a path into its components.
 
@@ -20,6 +155,10 @@ def parse_path(path, prefix=""):
     *Script Parameter* `#@ File`) for either of the parameters, so it is safe to
     use this in ImageJ Python scripts without additional measures.
 
+    The computed components are kept in a bounded cache, so repeatedly parsing
+    the same path is cheap. Every call returns a new `ParsedPath` object though,
+    which can be modified without affecting other results.
+
     **WARNING**: when passing in **Windows paths** literally, make sure to
     declare them as **raw strings** using the `r""` notation, otherwise
     unexpected things might happen if the path contains sections that Python
@@ -35,9 +174,10 @@ def parse_path(path, prefix=""):
 
     Returns
     -------
-    dict
-        The parsed (and possibly combined) path split into its components, with
-        the following keys:
+    ParsedPath
+        The parsed (and possibly combined) path split into its components. The
+        returned object is a `dict` with the following keys (that are also
+        available as attributes):
 
         - `orig` : The full string as passed into this function (possibly
           combined with the prefix in case one was specified).
@@ -61,29 +201,34 @@ def parse_path(path, prefix=""):
 
     >>> parse_path('/tmp/foo/file.suffix')
     {
-        "dname": "foo",
-        "ext": "",
-        "fname": "file",
-        "full": "/tmp/foo/file",
-        "basename": "file",
-        "orig": "/tmp/foo/file",
-        "parent": "/tmp/",
-        "path": "/tmp/foo/",
+        'orig': '/tmp/foo/file.suffix',
+        'full': '/tmp/foo/file.suffix',
+        'parent': '/tmp',
+        'path': '/tmp/foo/',
+        'dname': 'foo',
+        'fname': 'file.suffix',
+        'basename': 'file',
+        'ext': '.suffix',
     }
 
+    The components are also available as attributes:
+
+    >>> parse_path('/tmp/foo/file.suffix').basename
+    'file'
+
 
     POSIX-style path to a directory:
 
     >>> parse_path('/tmp/foo/')
     {
-        "dname": "foo",
-        "ext": "",
-        "fname": "",
-        "full": "/tmp/foo/",
-        "basename": "",
-        "orig": "/tmp/foo/",
-        "parent": "/tmp/",
-        "path": "/tmp/foo/",
+        'orig': '/tmp/foo/',
+        'full': '/tmp/foo/',
+        'parent': '/tmp',
+        'path': '/tmp/foo/',
+        'dname': 'foo',
+        'fname': '',
+        'basename': '',
+        'ext': '',
     }
 
 
@@ -91,14 +236,14 @@ def parse_path(path, prefix=""):
 
     >>> parse_path(r'C:\Temp\new\file.ext')
     {
-        "dname": "new",
-        "ext": ".ext",
-        "fname": "file.ext",
-        "full": "C:/Temp/new/file.ext",
-        "basename": "file",
-        "orig": "C:\\Temp\\new\\file.ext",
-        "parent": "C:/Temp",
-        "path": "C:/Temp/new/",
+        'orig': 'C:\\Temp\\new\\file.ext',
+        'full': 'C:/Temp/new/file.ext',
+        'parent': 'C:/Temp',
+        'path': 'C:/Temp/new/',
+        'dname': 'new',
+        'fname': 'file.ext',
+        'basename': 'file',
+        'ext': '.ext',
     }
 
 
@@ -106,39 +251,86 @@ def parse_path(path, prefix=""):
 
     >>> parse_path("/path/to/some/nice.OME.tIf")
     {
-        "basename": "nice",
-        "dname": "some",
-        "ext": ".OME.tIf",
-        "fname": "nice.OME.tIf",
-        "full": "/path/to/some/nice.OME.tIf",
-        "orig": "/path/to/some/nice.OME.tIf",
-        "parent": "/path/to/",
-        "path": "/path/to/some/",
+        'orig': '/path/to/some/nice.OME.tIf',
+        'full': '/path/to/some/nice.OME.tIf',
+        'parent': '/path/to',
+        'path': '/path/to/some/',
+        'dname': 'some',
+        'fname': 'nice.OME.tIf',
+        'basename': 'nice',
+        'ext': '.OME.tIf',
     }
     """
     path = str(path)
     if prefix:
-        # remove leading slash, otherwise join() will discard the first path:
-        if path.startswith("/"):
-            path = path[1:]
-        path = os.path.join(str(prefix), path)
-    parsed = {}
-    parsed["orig"] = path
-    path = path.replace("\\", sep)
-    parsed["full"] = path
-    folder = os.path.dirname(path)
-    parsed["path"] = folder + sep
-    parsed["parent"] = os.path.dirname(folder)
-    parsed["fname"] = os.path.basename(path)
-    parsed["dname"] = os.path.basename(os.path.dirname(parsed["path"]))
-    base, ext = os.path.splitext(parsed["fname"])
-    parsed["ext"] = ext
-    parsed["basename"] = base
-    if base.lower().endswith(".ome") and ext.lower().startswith(".tif"):
-        parsed["basename"] = base[:-4]
-        parsed["ext"] = base[-4:] + ext
+        prefix = str(prefix)
+        key = (path, prefix)
+    else:
+        key = path
+    components = _PARSE_CACHE.get(key)
+    if components is None:
+        components = _components(_join_prefix(path, prefix))
+        with _PARSE_CACHE_LOCK:
+            if len(_PARSE_CACHE) >= _PARSE_CACHE_SIZE:
+                _PARSE_CACHE.clear()
+            _PARSE_CACHE[key] = components
+
+    return ParsedPath(components)
+
+
+def parse_paths(paths, prefix=""):
+    """Parse a list of paths into columns of components in a single pass.
+
+    This is the bulk variant of `parse_path()`, meant for large file lists
+    (e.g. all tiles of an acquisition). Instead of one object per path it
+    returns one list per component, bypassing the `parse_path()` cache. The
+    folder related components are only computed once per folder, making this
+    considerably faster than calling `parse_path()` on each path for lists
+    where many files share the same folder.
 
-    return parsed
+    Parameters
+    ----------
+    paths : iterable(str or str-like)
+        The paths to be parsed into components.
+    prefix : str or str-like, optional
+        An optional path component that will be prefixed to each of the paths,
+        see `parse_path()` for details.
+
+    Returns
+    -------
+    dict(str, list(str))
+        A dict having the same keys as described in `parse_path()`, each value
+        being a list with the corresponding component of all given paths (in
+        the same order as the input).
+
+    Example
+    -------
+    >>> parse_paths(["/data/a.ome.tif", "/data/b.czi"])["basename"]
+    ['a', 'b']
+    """
+    prefix = str(prefix) if prefix else ""
+    columns = dict((key, []) for key in ParsedPath._KEYS)
+    # the `parent`, `path` and `dname` components by folder:
+    folders = {}
+    for item in paths:
+        orig = _join_prefix(str(item), prefix)
+        full = orig.replace("\\", sep)
+        folder, fname = os.path.split(full)
+        folder_components = folders.get(folder)
+        if folder_components is None:
+            parent, dname = os.path.split(folder)
+            folder_components = folders[folder] = (parent, folder + sep, dname)
+        basename, ext = _split_image_ext(fname)
+        columns["orig"].append(orig)
+        columns["full"].append(full)
+        columns["parent"].append(folder_components[0])
+        columns["path"].append(folder_components[1])
+        columns["dname"].append(folder_components[2])
+        columns["fname"].append(fname)
+        columns["basename"].append(basename)
+        columns["ext"].append(ext)
+
+    return columns
 
 
 def join2(path1, path2):
@@ -180,7 +372,483 @@ def jython_fiji_exists(path):
         return False
 
 
-def listdir_matching(path, suffix, fullpath=False, sort=False, regex=False):
+# process-wide cache for results of `exists()`, mapping absolute paths to tuples
+# of (timestamp, result) in the order they were stored - disabled as long as the
+# TTL is None:
+_STAT_CACHE = OrderedDict()
+_STAT_CACHE_TTL = None
+_STAT_CACHE_LOCK = threading.Lock()
+# the maximum number of cached results, expired ones are dropped before:
+_STAT_CACHE_SIZE = 10000
+
+
+def enable_stat_cache(ttl=5.0):
+    """Enable caching the results of `exists()` for a given time.
+
+    On network shares every existence check is a round-trip to the file server.
+    With the cache enabled, repeated checks for the same path (e.g. for output
+    folders and result files in a batch loop) are answered from memory as long
+    as the cached result is younger than `ttl` seconds. Changes done through
+    this package (`create_directory()` and the exports in `imcflibs.imagej`)
+    update the cache directly, changes done by anything else will only be
+    noticed after the TTL has expired (or after calling
+    `invalidate_stat_cache()`).
+
+    Parameters
+    ----------
+    ttl : float, optional
+        The number of seconds a cached result stays valid, by default 5.0.
+    """
+    global _STAT_CACHE_TTL  # pylint: disable-msg=global-statement
+    with _STAT_CACHE_LOCK:
+        _STAT_CACHE_TTL = float(ttl)
+
+
+def disable_stat_cache():
+    """Disable the cache for `exists()` and discard all cached results."""
+    global _STAT_CACHE_TTL  # pylint: disable-msg=global-statement
+    with _STAT_CACHE_LOCK:
+        _STAT_CACHE_TTL = None
+        _STAT_CACHE.clear()
+
+
+def invalidate_stat_cache(path=None):
+    """Discard cached results of `exists()`.
+
+    Parameters
+    ----------
+    path : str or str-like, optional
+        The path to discard the cached result for (including all cached paths
+        below it, in case it is a directory). If None (the default), the entire
+        cache will be cleared.
+    """
+    with _STAT_CACHE_LOCK:
+        if path is None:
+            _STAT_CACHE.clear()
+            return
+        key = os.path.abspath(str(path))
+        below = key.rstrip(sep) + sep
+        for cached in [x for x in _STAT_CACHE if x == key or x.startswith(below)]:
+            del _STAT_CACHE[cached]
+
+
+def _store_stat(key, timestamp, present):
+    """Store a result in the cache for `exists()`, dropping outdated ones.
+
+    Has to be called while holding `_STAT_CACHE_LOCK`. As the entries are kept
+    in the order they were stored, the expired ones (and the oldest ones in
+    case the cache is full) are found at the front.
+
+    Parameters
+    ----------
+    key : str
+        The absolute path.
+    timestamp : float
+        The time the result has been determined.
+    present : bool
+        Whether the path exists.
+    """
+    ttl = _STAT_CACHE_TTL
+    if ttl is None:
+        return
+    _STAT_CACHE.pop(key, None)
+    _STAT_CACHE[key] = (timestamp, present)
+    while len(_STAT_CACHE) > 1:
+        oldest = next(iter(_STAT_CACHE))
+        if len(_STAT_CACHE) <= _STAT_CACHE_SIZE:
+            if timestamp - _STAT_CACHE[oldest][0] < ttl:
+                break
+        del _STAT_CACHE[oldest]
+
+
+def update_stat_cache(path, present=True):
+    """Record the existence of a path in the cache for `exists()`.
+
+    To be called after creating (or removing) files or directories to keep the
+    cache up-to-date without another check. Recording a path as present also
+    marks all of its parent directories as present (they might have been
+    created along with it). Does nothing if the cache is disabled.
+
+    Parameters
+    ----------
+    path : str or str-like
+        The path that has been created or removed.
+    present : bool, optional
+        Whether the path exists now, by default True.
+    """
+    if _STAT_CACHE_TTL is None:
+        return
+    if not present:
+        invalidate_stat_cache(path)
+    key = os.path.abspath(str(path))
+    now = time.time()
+    with _STAT_CACHE_LOCK:
+        _store_stat(key, now, present)
+        if not present:
+            return
+        parent = os.path.dirname(key)
+        while parent != key:
+            _store_stat(parent, now, True)
+            key, parent = parent, os.path.dirname(parent)
+
+
+def exists(path):
+    """Check if a path exists, using the cache if enabled.
+
+    Calls `jython_fiji_exists()` when running in Jython and `os.path.exists()`
+    otherwise. See `enable_stat_cache()` for details on the cache.
+
+    Parameters
+    ----------
+    path : str or str-like
+        The path to check.
+
+    Returns
+    -------
+    bool
+    """
+    ttl = _STAT_CACHE_TTL
+    if ttl is None:
+        return _exists(path)
+
+    key = os.path.abspath(str(path))
+    now = time.time()
+    cached = _STAT_CACHE.get(key)
+    if cached is not None and now - cached[0] < ttl:
+        return cached[1]
+
+    result = _exists(path)
+    with _STAT_CACHE_LOCK:
+        _store_stat(key, now, result)
+    return result
+
+
+class _ListdirEntry(object):
+    """Minimal stand-in for `os.DirEntry` where `os.scandir()` is unavailable.
+
+    On Python 2.7 / Jython 2.7 the listing is done with `os.listdir()` and each
+    entry is `lstat()`-ed (lazily and at most once) to provide the same cheap
+    type checks and size information `os.DirEntry` offers.
+    """
+
+    __slots__ = ("name", "path", "_lstat")
+
+    def __init__(self, parent, name):
+        self.name = name
+        self.path = os.path.join(parent, name)
+        self._lstat = None
+
+    def stat(self, follow_symlinks=True):
+        """Get the stat result of the entry, cached if not following links."""
+        if self._lstat is None:
+            self._lstat = os.lstat(self.path)
+        if follow_symlinks and stat.S_ISLNK(self._lstat.st_mode):
+            return os.stat(self.path)
+        return self._lstat
+
+    def is_symlink(self):
+        """Check if the entry is a symbolic link."""
+        return stat.S_ISLNK(self.stat(follow_symlinks=False).st_mode)
+
+    def is_dir(self, follow_symlinks=True):
+        """Check if the entry is a directory (or a symbolic link pointing to one)."""
+        try:
+            return stat.S_ISDIR(self.stat(follow_symlinks).st_mode)
+        except OSError:
+            return False
+
+
+def _scandir(path):
+    """List a directory, returning `os.DirEntry`-like objects.
+
+    Parameters
+    ----------
+    path : str
+        The directory to list.
+
+    Returns
+    -------
+    list(os.DirEntry) or list(_ListdirEntry)
+    """
+    if hasattr(os, "scandir"):
+        return list(os.scandir(path))
+    return [_ListdirEntry(path, name) for name in os.listdir(path)]
+
+
+def _walk_entries(source, max_depth=None):
+    """Walk a directory tree top-down, yielding the entries of each directory.
+
+    Symbolic links to directories are not followed, unreadable directories are
+    silently skipped (both same as `os.walk()` does by default).
+
+    Parameters
+    ----------
+    source : str
+        The directory to start walking from.
+    max_depth : int, optional
+        The maximum depth to descend to, `0` meaning only `source` itself will
+        be scanned. By default the entire tree is walked.
+
+    Yields
+    ------
+    (str, list, list)
+        The directory path, its sub-directory entries and its file entries.
+    """
+    pending = [(source, 0)]
+    while pending:
+        dirpath, depth = pending.pop()
+        try:
+            entries = _scandir(dirpath)
+        except OSError:
+            continue
+        dirs = []
+        files = []
+        for entry in entries:
+            if entry.is_dir():
+                dirs.append(entry)
+            else:
+                files.append(entry)
+        yield dirpath, dirs, files
+
+        if max_depth is not None and depth >= max_depth:
+            continue
+        # push in reverse order so sub-directories are processed in the order
+        # they were listed in:
+        for entry in reversed(dirs):
+            if not entry.is_symlink():
+                pending.append((entry.path, depth + 1))
+
+
+class DirectoryIndex(object):
+    """Persistent index of directory listings, revalidated by directory mtime.
+
+    The index stores the listing of every directory it has been asked about,
+    together with the directory's modification time. A cached listing is only
+    re-used if the mtime of the directory is unchanged, so answering a query
+    costs a single `stat()` call per directory instead of a full listing (plus
+    the checks for telling files from sub-directories).
+
+    Listings are kept in memory and can be persisted in a JSON sidecar file so
+    subsequent runs (or other scripts) can re-use them.
+
+    NOTE: the modification time of a directory only changes if entries are
+    added, removed or renamed. This is fine for listings, but it does *NOT*
+    reflect changes of the *contents* of the files inside the directory.
+
+    Parameters
+    ----------
+    index_file : str, optional
+        The path to the JSON file used to persist the index. If the file exists
+        it will be loaded, if not it will be created by calling `save()`. If
+        omitted, the index is kept in memory only.
+
+    Example
+    -------
+    >>> index = DirectoryIndex("/data/.imcflibs-dirindex.json")
+    >>> tifs = listdir_matching("/data/plate_01", ".tif", index=index)
+    >>> dirs = find_dirs_containing_filetype("/data", ".czi", index=index)
+    >>> index.save()
+    """
+
+    _VERSION = 1
+
+    # listings of directories modified less than this number of seconds before
+    # being scanned are not trusted: coarse timestamp granularity (e.g. on SMB
+    # shares) might hide further changes happening within the same interval
+    _RACY_SECONDS = 2.0
+
+    def __init__(self, index_file=None):
+        self.index_file = index_file
+        self._entries = {}
+        self._dirty = False
+        if index_file is not None and os.path.isfile(index_file):
+            self.load()
+
+    def __len__(self):
+        """Get the number of indexed directories."""
+        return len(self._entries)
+
+    def load(self):
+        """Load the index from its JSON sidecar file.
+
+        An index file with an unknown format version or invalid contents (e.g.
+        being truncated by an interrupted run) is ignored, i.e. the index will
+        be empty and re-built on demand.
+        """
+        try:
+            with open(self.index_file, "r") as fh:
+                data = json.load(fh)
+        except ValueError as err:
+            log.warning("Ignoring invalid index file [%s]: %s", self.index_file, err)
+            return
+        if not isinstance(data, dict) or data.get("version") != self._VERSION:
+            log.warning("Ignoring index file with unknown version: %s", self.index_file)
+            return
+        self._entries = data.get("entries", {})
+        self._dirty = False
+        log.debug("Loaded index of %s directories.", len(self._entries))
+
+    def save(self):
+        """Write the index to its JSON sidecar file (if it has been modified).
+
+        The index is written to a temporary file first that then replaces the
+        sidecar file, so an interrupted run never leaves a truncated index.
+        """
+        if self.index_file is None or not self._dirty:
+            return
+        dump_json({"version": self._VERSION, "entries": self._entries}, self.index_file)
+        self._dirty = False
+        log.debug("Saved index of %s directories.", len(self._entries))
+
+    def invalidate(self, path=None):
+        """Drop cached listings, either for a single directory or all of them.
+
+        Parameters
+        ----------
+        path : str, optional
+            The directory whose cached listing should be dropped. If omitted,
+            the entire index will be cleared.
+        """
+        if path is None:
+            self._entries = {}
+        else:
+            self._entries.pop(os.path.abspath(str(path)), None)
+        self._dirty = True
+
+    def _entry(self, path, size=False):
+        """Get the (possibly re-scanned) index entry of a directory.
+
+        Parameters
+        ----------
+        path : str
+            The directory.
+        size : bool, optional
+            Whether the entry needs to contain the total size of the files. If
+            the directory has to be scanned, their sizes are then collected in
+            the same pass. By default False, as it requires a `stat()` call for
+            every file (unless the platform's `os.scandir()` provides them).
+        """
+        key = os.path.abspath(str(path))
+        mtime = os.stat(key).st_mtime
+        entry = self._entries.get(key)
+        if (
+            entry is not None
+            and entry["mtime"] == mtime
+            and not entry["racy"]
+            and (not size or "size" in entry)
+        ):
+            return entry
+
+        names = []
+        dirs = []
+        links = []
+        total = 0
+        for dentry in _scandir(key):
+            names.append(dentry.name)
+            if dentry.is_dir():
+                dirs.append(dentry.name)
+                if dentry.is_symlink():
+                    links.append(dentry.name)
+            elif size and not dentry.is_symlink():
+                total += dentry.stat(follow_symlinks=False).st_size
+        entry = {
+            "mtime": mtime,
+            "racy": time.time() - mtime < self._RACY_SECONDS,
+            "names": names,
+            "dirs": dirs,
+            "links": links,
+        }
+        if size:
+            entry["size"] = total
+        self._entries[key] = entry
+        self._dirty = True
+        return entry
+
+    def dir_size(self, path):
+        """Get the total size of the files located directly in a directory.
+
+        The size is cached along with the listing, hence it is only re-computed
+        if the directory's mtime has changed. Symbolic links are skipped.
+
+        NOTE: files changing their size without entries being added to or
+        removed from the directory (e.g. a file being appended to) are *NOT*
+        detected as the directory's mtime stays the same in that case.
+
+        Parameters
+        ----------
+        path : str
+            The directory to get the size for (not including sub-directories).
+
+        Returns
+        -------
+        int
+            The size in bytes.
+        """
+        return self._entry(path, size=True)["size"]
+
+    def subdirs(self, path):
+        """Get the sub-directories of a directory, skipping symbolic links.
+
+        Parameters
+        ----------
+        path : str
+            The directory to list.
+
+        Returns
+        -------
+        list(str)
+            The full paths of the sub-directories.
+        """
+        entry = self._entry(path)
+        return [os.path.join(path, x) for x in entry["dirs"] if x not in entry["links"]]
+
+    def listdir(self, path):
+        """Get the names of all entries of a directory, like `os.listdir()`.
+
+        Parameters
+        ----------
+        path : str
+            The directory to list.
+
+        Returns
+        -------
+        list(str)
+        """
+        return list(self._entry(path)["names"])
+
+    def walk(self, top):
+        """Walk a directory tree top-down, like `os.walk()`.
+
+        Symbolic links to directories are reported but not followed, same as
+        `os.walk()` does by default.
+
+        Parameters
+        ----------
+        top : str
+            The directory to start walking from.
+
+        Yields
+        ------
+        (str, list(str), list(str))
+            A tuple with the directory path and the names of the sub-directories
+            and files contained in it.
+        """
+        try:
+            entry = self._entry(top)
+        except OSError:
+            return
+        dirs = list(entry["dirs"])
+        subdirs = set(dirs)
+        files = [x for x in entry["names"] if x not in subdirs]
+        yield top, dirs, files
+        for name in dirs:
+            if name in entry["links"]:
+                continue
+            for result in self.walk(os.path.join(top, name)):
+                yield result
+
+
+def listdir_matching(path, suffix, fullpath=False, sort=False, regex=False, index=None):
     """Get a list of files in a directory matching a given suffix.
 
     Parameters
@@ -199,30 +867,221 @@ def listdir_matching(path, suffix, fullpath=False, sort=False, regex=False):
     regex : bool, optional
         If set to True, uses the suffix-string as regular expression to match
         filenames. By default False.
+    index : DirectoryIndex, optional
+        An index to answer the query from, avoiding to re-list the directory if
+        it hasn't changed since it has been indexed.
 
     Returns
     -------
     list
         All file names in the directory matching the suffix (without path!).
     """
-    matching_files = list()
-    for candidate in os.listdir(path):
-        if not regex and candidate.lower().endswith(suffix.lower()):
-            # log.debug("Found file %s", candidate)
-            if fullpath:
-                matching_files.append(os.path.join(path, candidate))
-            else:
+    if regex:
+        matches = listdir_matching_multi(
+            path, regexes=[suffix], fullpath=fullpath, sort=sort, index=index
+        )
+    else:
+        matches = listdir_matching_multi(
+            path, suffixes=[suffix], fullpath=fullpath, sort=sort, index=index
+        )
+    return matches[suffix]
+
+
+def listdir_matching_multi(
+    path, suffixes=(), regexes=(), fullpath=False, sort=False, index=None
+):
+    """Get the files in a directory matching any of the given patterns.
+
+    The directory is listed only once and all patterns are prepared once (i.e.
+    regular expressions are compiled upfront), so this is considerably faster
+    than calling `listdir_matching()` multiple times for the same directory.
+    Matching is done the same (case-insensitive) way `listdir_matching()` does.
+
+    Parameters
+    ----------
+    path : str
+        The directory to scan for files.
+    suffixes : list(str), optional
+        Suffixes to match filenames against.
+    regexes : list(str), optional
+        Regular expressions to match filenames against.
+    fullpath : bool, optional
+        If set to True, the returned lists will contain the full paths to the
+        matching files (the default is False, which will result in the file
+        names only, without path).
+    sort : bool, optional
+        If set to True, the returned lists will be sorted using
+        `imcflibs.strtools.sort_alphanumerically()`.
+    index : DirectoryIndex, optional
+        An index to answer the query from, avoiding to re-list the directory if
+        it hasn't changed since it has been indexed.
+
+    Returns
+    -------
+    collections.OrderedDict
+        A dict having the given patterns (suffixes and regular expressions in
+        the order they were given) as keys and the list of matching file names
+        as values. A file name matching multiple patterns will be contained in
+        all corresponding lists.
+
+    Raises
+    ------
+    ValueError
+        Raised in case a pattern is given more than once (e.g. the same string
+        as a suffix and as a regular expression), as the results are keyed by
+        the patterns.
+
+    Example
+    -------
+    >>> matches = listdir_matching_multi("/data", suffixes=[".czi", ".ome.tif"])
+    >>> czi_files = matches[".czi"]
+    """
+    patterns = list(suffixes) + list(regexes)
+    if len(set(patterns)) != len(patterns):
+        duplicates = sorted(set(x for x in patterns if patterns.count(x) > 1))
+        raise ValueError("Patterns given more than once: %s" % ", ".join(duplicates))
+
+    if index is not None:
+        candidates = index.listdir(path)
+    else:
+        candidates = os.listdir(path)
+
+    matches = OrderedDict()
+    lowered_suffixes = []
+    for suffix in suffixes:
+        matches[suffix] = []
+        lowered_suffixes.append((suffix.lower(), matches[suffix]))
+    compiled_regexes = []
+    for regex in regexes:
+        matches[regex] = []
+        compiled_regexes.append((re.compile(regex.lower()), matches[regex]))
+
+    for candidate in candidates:
+        lowered = candidate.lower()
+        if fullpath:
+            candidate = os.path.join(path, candidate)
+        for suffix, matching_files in lowered_suffixes:
+            if lowered.endswith(suffix):
                 matching_files.append(candidate)
-        if regex and re.match(suffix.lower(), candidate.lower()):
-            if fullpath:
-                matching_files.append(os.path.join(path, candidate))
-            else:
+        for regex, matching_files in compiled_regexes:
+            if regex.match(lowered):
                 matching_files.append(candidate)
 
     if sort:
-        matching_files = strtools.sort_alphanumerically(matching_files)
+        for pattern, matching_files in matches.items():
+            matches[pattern] = strtools.sort_alphanumerically(matching_files)
+
+    return matches
+
 
-    return matching_files
+def watch_matching(
+    path, suffix, interval=5.0, settle=2, idle_timeout=None, seen=None, regex=False
+):
+    """Watch a directory, yielding files matching a suffix once they are complete.
+
+    The directory is polled using `listdir_matching()`, a file is considered
+    being complete (i.e. it's not being written any more) once its size and
+    modification time haven't changed for `settle` consecutive polls. This
+    allows to process files while an acquisition is still running.
+
+    Parameters
+    ----------
+    path : str
+        The directory to watch.
+    suffix : str
+        The suffix (or regular expression, see `regex`) to match file names.
+    interval : float, optional
+        The number of seconds to wait between two polls, by default 5.0.
+    settle : int, optional
+        The number of consecutive polls a file has to be unchanged before being
+        reported, by default 2.
+    idle_timeout : float, optional
+        Stop watching after this many seconds without any new or changing
+        files. By default the directory is watched forever.
+    seen : set, optional
+        Files (full paths) that should be ignored, e.g. as they have been
+        processed already. Reported files are added to this set.
+    regex : bool, optional
+        Passed on to `listdir_matching()`, by default False.
+
+    Yields
+    ------
+    str
+        The full path of a complete file. Files becoming complete in the same
+        poll are reported in natural sort order.
+
+    Example
+    -------
+    >>> for fname in watch_matching("/data/acquisition", ".czi", idle_timeout=600):
+    ...     process(fname)
+    ... # doctest: +SKIP
+    """
+    if seen is None:
+        seen = set()
+    pending = {}
+    last_activity = time.time()
+    while True:
+        ready = []
+        matching = listdir_matching(path, suffix, fullpath=True, sort=True, regex=regex)
+        for candidate in matching:
+            if candidate in seen:
+                continue
+            try:
+                stat_result = os.stat(candidate)
+            except OSError:  # vanished in the meantime
+                pending.pop(candidate, None)
+                continue
+            signature = (stat_result.st_size, stat_result.st_mtime)
+            previous = pending.get(candidate)
+            if previous is not None and previous[0] == signature:
+                unchanged = previous[1] + 1
+            else:
+                unchanged = 0
+                last_activity = time.time()
+            pending[candidate] = (signature, unchanged)
+            if unchanged >= settle:
+                ready.append(candidate)
+
+        for candidate in ready:
+            del pending[candidate]
+            seen.add(candidate)
+            yield candidate
+            # time spent by the consumer doesn't count as being idle:
+            last_activity = time.time()
+
+        idle = time.time() - last_activity
+        if not pending and idle_timeout is not None and idle >= idle_timeout:
+            log.info("No new files for %.1fs, stop watching [%s].", idle, path)
+            return
+        time.sleep(interval)
+
+
+def file_identity(path, hash_bytes=0):
+    """Get a cheap fingerprint of a file, to detect whether it has changed.
+
+    Parameters
+    ----------
+    path : str or str-like
+        The file to generate the fingerprint for.
+    hash_bytes : int, optional
+        If larger than zero, an MD5 hash of (up to) this number of bytes from
+        the beginning of the file is included. This allows to detect files that
+        have been replaced by different ones with the same size and mtime, at
+        the cost of reading the given amount of data. By default 0.
+
+    Returns
+    -------
+    dict
+        The fingerprint containing the keys `size` and `mtime` (and `md5` if
+        requested).
+    """
+    path = str(path)
+    stat_result = os.stat(path)
+    identity = {"size": stat_result.st_size, "mtime": stat_result.st_mtime}
+    if hash_bytes > 0:
+        with open(path, "rb") as fh:
+            identity["md5"] = hashlib.md5(fh.read(hash_bytes)).hexdigest()
+    return identity
 
 
 def image_basename(orig_name):
@@ -275,6 +1134,45 @@ def gen_name_from_orig(path, orig_name, tag, suffix):
     return name
 
 
+def gen_names_from_orig(path, orig_names, tag, suffix):
+    """Derive file names for a list of input files in a single pass.
+
+    This is the bulk variant of `gen_name_from_orig()`, applying the same
+    rules (including the special treatment of *OME-TIFF* suffixes) to all the
+    given input file names.
+
+    Parameters
+    ----------
+    path : str or object that can be cast to a str
+        The output path.
+    orig_names : iterable(str or object that can be cast to a str)
+        The input file names, may contain arbitrary path components.
+    tag : str
+        An optional tag to be added at the end of the new file names.
+    suffix : str
+        The new file name suffix, which also sets the file format for BF.
+
+    Returns
+    -------
+    list(str)
+        The newly generated file names with their full path, in the same order
+        as the input file names.
+
+    Example
+    -------
+    >>> gen_names_from_orig("/out", ["/in/a.ome.tif", "/in/b.czi"], "-avg", ".h5")
+    ['/out/a-avg.h5', '/out/b-avg.h5']
+    """
+    # joining with an empty string adds a trailing separator if necessary:
+    base = os.path.join(str(path), "")
+    ending = tag + suffix
+    names = []
+    for orig_name in orig_names:
+        fname = os.path.basename(str(orig_name).replace("\\", sep))
+        names.append(base + _split_image_ext(fname)[0] + ending)
+    return names
+
+
 def derive_out_dir(in_dir, out_dir):
     """Derive `out_dir` from its own value and the value of `in_dir`.
 
@@ -303,7 +1201,79 @@ def derive_out_dir(in_dir, out_dir):
     return out_dir
 
 
-def find_dirs_containing_filetype(source, filetype):
+def iter_dirs_containing_filetype(source, filetype, max_depth=None, limit=None):
+    """Recursively find directories containing files with a given suffix.
+
+    This is the streaming counterpart of `find_dirs_containing_filetype()`,
+    yielding each matching directory as soon as it has been found, so
+    processing can start before the entire tree has been scanned.
+
+    Parameters
+    ----------
+    source : str
+        Path to base directory to start recursive search in.
+    filetype : str
+        Filetype (string pattern) that should be matched against filenames in
+        the directories.
+    max_depth : int, optional
+        The maximum depth to descend to, `0` meaning only `source` itself will
+        be checked. By default the entire tree is searched.
+    limit : int, optional
+        Stop the search after this many directories have been found.
+
+    Yields
+    ------
+    str
+        The path of a directory containing files with the given suffix, with a
+        trailing slash.
+    """
+    if limit is not None and limit < 1:
+        return
+    found = 0
+    for dirpath, _, files in _walk_entries(source, max_depth):
+        if any(filetype in entry.name for entry in files):
+            yield dirpath + "/"
+            found += 1
+            if limit is not None and found >= limit:
+                return
+
+
+def iter_file_sizes(source, max_depth=None, limit=None):
+    """Recursively yield the sizes of all files in a directory tree.
+
+    Symbolic links are skipped. The size information is taken from the stat
+    results cached while listing the directories (where the platform provides
+    them), avoiding additional `stat()` calls per file.
+
+    Parameters
+    ----------
+    source : str
+        Path to base directory to start recursive search in.
+    max_depth : int, optional
+        The maximum depth to descend to, `0` meaning only files in `source`
+        itself will be reported. By default the entire tree is walked.
+    limit : int, optional
+        Stop after reporting this many files.
+
+    Yields
+    ------
+    (str, int)
+        The full path of a file and its size in bytes.
+    """
+    if limit is not None and limit < 1:
+        return
+    count = 0
+    for _, _, files in _walk_entries(source, max_depth):
+        for entry in files:
+            if entry.is_symlink():
+                continue
+            yield entry.path, entry.stat(follow_symlinks=False).st_size
+            count += 1
+            if limit is not None and count >= limit:
+                return
+
+
+def find_dirs_containing_filetype(source, filetype, index=None):
     """Recursively list directories containing files with a given suffix.
 
     Parameters
@@ -313,17 +1283,23 @@ def find_dirs_containing_filetype(source, filetype):
     filetype : str
         Filetype (string pattern) that should be matched against filenames in
         the directories.
+    index : DirectoryIndex, optional
+        An index to answer the query from, only directories that have changed
+        since they have been indexed will be re-listed.
 
     Returns
     -------
     list(str)
         List of all dirs that contain files with the given suffix / filetype.
     """
+    if index is None:
+        return list(iter_dirs_containing_filetype(source, filetype))
+
     dirs_containing_filetype = []
 
     # walk recursively through all directories
     # list their paths and all files inside (=os.walk)
-    for dirname, _, filenames in os.walk(source):
+    for dirname, _, filenames in index.walk(source):
         # stop when encountering a directory that contains "filetype"
         # and store the directory path
         for filename in filenames:
@@ -334,13 +1310,58 @@ def find_dirs_containing_filetype(source, filetype):
     return dirs_containing_filetype
 
 
-def folder_size(source):
-    """Get the total size of a given directory and its subdirectories.
+def _scan_size(dirpath, index=None):
+    """Get the size of the files in a directory and a list of its sub-directories.
+
+    Parameters
+    ----------
+    dirpath : str
+        The directory to scan (not recursively).
+    index : DirectoryIndex, optional
+        An index to take the (cached) results from.
+
+    Returns
+    -------
+    (int, list(str))
+        The total size of the files directly inside the directory (skipping
+        symbolic links) and the full paths of its sub-directories.
+    """
+    if index is not None:
+        try:
+            return index.dir_size(dirpath), index.subdirs(dirpath)
+        except OSError:  # vanished or unreadable, same as below
+            return 0, []
+
+    size = 0
+    subdirs = []
+    try:
+        entries = _scandir(dirpath)
+    except OSError:
+        return size, subdirs
+    for entry in entries:
+        if entry.is_symlink():
+            continue
+        if entry.is_dir():
+            subdirs.append(entry.path)
+        else:
+            size += entry.stat(follow_symlinks=False).st_size
+    return size, subdirs
+
+
+def _threaded_folder_size(source, threads, index=None):
+    """Sum up the size of a directory tree using a pool of worker threads.
+
+    The tree is scanned level by level, the directories of each level being
+    distributed across the workers.
 
     Parameters
     ----------
     source : str
         Directory for which the size should be determined.
+    threads : int
+        The number of worker threads to use.
+    index : DirectoryIndex, optional
+        An index to take cached per-directory sizes from.
 
     Returns
     -------
@@ -348,13 +1369,49 @@ def folder_size(source):
         The total size of all files in the source dir and subdirs in bytes.
     """
     total_size = 0
-    for dirpath, _, filenames in os.walk(source):
-        for fname in filenames:
-            fpath = os.path.join(dirpath, fname)
-            # skip if it is symbolic link
-            if not os.path.islink(fpath):
-                total_size += os.path.getsize(fpath)
+    pending = [source]
+    while pending:
+        results = run_threaded(lambda x: _scan_size(x, index), pending, threads)
+        pending = []
+        for size, subdirs in results:
+            total_size += size
+            pending.extend(subdirs)
+    return total_size
+
 
+def folder_size(source, threads=1, index=None):
+    """Get the total size of a given directory and its subdirectories.
+
+    Parameters
+    ----------
+    source : str
+        Directory for which the size should be determined.
+    threads : int, optional
+        The number of threads to use for scanning the directory tree. Using more
+        than one thread is beneficial on network storage, where the time is
+        mostly spent waiting for the file server. By default 1.
+    index : DirectoryIndex, optional
+        An index for caching the per-directory sizes. Directories that haven't
+        changed their mtime since they have been indexed won't be re-scanned.
+        See `DirectoryIndex.dir_size()` for the limitations of this approach.
+
+    Returns
+    -------
+    int
+        The total size of all files in the source dir and subdirs in bytes.
+    """
+    if threads > 1:
+        return _threaded_folder_size(source, threads, index)
+
+    if index is None:
+        return sum(size for _, size in iter_file_sizes(source))
+
+    total_size = 0
+    pending = [source]
+    while pending:
+        size, subdirs = _scan_size(pending.pop(), index)
+        total_size += size
+        pending.extend(subdirs)
     return total_size
 
 
@@ -364,24 +1421,33 @@ def create_directory(new_path):
     This is a workaround for Python 2.7 where `os.makedirs()` is lacking
     the `exist_ok` parameter that is present in Python 3.2 and newer.
 
+    If the cache for `exists()` is enabled, it is used for the check and updated
+    when the directory is created.
+
     Parameters
     ----------
     new_path : str
         Path where the new directory should be created.
     """
 
-    if not os.path.exists(new_path):
-        os.makedirs(new_path)
+    if not exists(new_path):
+        try:
+            os.makedirs(new_path)
+        except OSError as err:
+            # the (cached) check might be outdated, or the directory has been
+            # created concurrently in the meantime:
+            if err.errno != errno.EEXIST or not os.path.isdir(new_path):
+                raise
+        update_stat_cache(new_path)
 
 
-# pylint: disable-msg=C0103
-#   we use the variable name 'exists' in its common spelling (lowercase), so
-#   removing this workaround will be straightforward at a later point
+# the uncached check used by `exists()`, removing this workaround will be
+# straightforward at a later point
 if platform.python_implementation() == "Jython":  # pragma: no cover
     # pylint: disable-msg=F0401
     #   java.lang is only importable within Jython, pylint would complain
     import java.lang
 
-    exists = jython_fiji_exists
+    _exists = jython_fiji_exists
 else:
-    exists = os.path.exists
+    _exists = os.path.exists
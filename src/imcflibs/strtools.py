@@ -1,9 +1,13 @@
 """String related helper functions."""
 
+import bisect
 import re
 
 from ._jython_compat import file_types
 
+# pre-compiled splitter for natural sorting (separating runs of digits):
+_DIGIT_RUNS = re.compile("([0-9]+)")
+
 
 # this is taken from numpy's iotools:
 def _is_string_like(obj):
@@ -81,10 +85,15 @@ def filename(name):
 def flatten(lst):
     """Make a single string from a list of strings.
 
+    The result is assembled using `str.join()`, so the time required is linear
+    in the total length of the strings (as opposed to repeated concatenation,
+    which is quadratic e.g. in Jython where strings are immutable Java objects).
+
     Parameters
     ----------
-    lst : list(str)
-        The list of strings to be flattened.
+    lst : iterable(str)
+        The list (or any other iterable, including generators) of strings to be
+        flattened.
 
     Returns
     -------
@@ -94,11 +103,10 @@ def flatten(lst):
     -------
     >>> flatten(('foo', 'bar'))
     'foobar'
+    >>> flatten(x for x in ('foo', 'bar'))
+    'foobar'
     """
-    flat = ""
-    for line in lst:
-        flat += line
-    return flat
+    return "".join(lst)
 
 
 def strip_prefix(string, prefix):
@@ -122,6 +130,34 @@ def strip_prefix(string, prefix):
     return string
 
 
+def natural_sort_key(text):
+    """Generate a key for sorting strings in a natural (alphanumerical) way.
+
+    Runs of digits are converted to integers (so "foo-2" sorts before "foo-10")
+    and all other parts are compared case-insensitively.
+
+    Parameters
+    ----------
+    text : str
+        The string to generate the sort key for.
+
+    Returns
+    -------
+    tuple
+        The key to be used for comparisons, alternating between (lower-cased)
+        text parts and numbers.
+
+    Example
+    -------
+    >>> natural_sort_key("Tile-12_z3.tif")
+    ('tile-', 12, '_z', 3, '.tif')
+    """
+    parts = _DIGIT_RUNS.split(text.lower())
+    # every second part is a run of digits as the splitter is a capture group:
+    parts[1::2] = map(int, parts[1::2])
+    return tuple(parts)
+
+
 def sort_alphanumerically(data):
     """Sort a list alphanumerically.
 
@@ -142,14 +178,84 @@ def sort_alphanumerically(data):
     >>> sort_alphanumerically([ "foo-1", "foo-2", "foo-10" ])
     ["foo-1", "foo-2", "foo-10"]
     """
+    return sorted(data, key=natural_sort_key)
+
 
-    def convert(text):
-        return int(text) if text.isdigit() else text.lower()
+class NaturalSortedList(object):
+    """A list of strings that is kept in natural (alphanumerical) sort order.
 
-    def alphanum_key(key):
-        return [convert(c) for c in re.split("([0-9]+)", key)]
+    The sort keys (see `natural_sort_key()`) are computed only once per item
+    and kept alongside the items, so new items (e.g. files arriving in a hot
+    folder) can be inserted using a binary search instead of re-sorting the
+    entire list.
+
+    Parameters
+    ----------
+    items : iterable(str), optional
+        The initial items of the list.
+
+    Example
+    -------
+    >>> files = NaturalSortedList(["tile-1.tif", "tile-10.tif"])
+    >>> files.add("tile-2.tif")
+    >>> list(files)
+    ['tile-1.tif', 'tile-2.tif', 'tile-10.tif']
+    """
+
+    def __init__(self, items=()):
+        pairs = sorted((natural_sort_key(x), x) for x in items)
+        self._keys = [key for key, _ in pairs]
+        self._items = [item for _, item in pairs]
+
+    def __len__(self):
+        """Get the number of items."""
+        return len(self._items)
+
+    def __iter__(self):
+        """Iterate over the items in sorted order."""
+        return iter(self._items)
+
+    def __getitem__(self, index):
+        """Get an item (or a slice of items) by its position."""
+        return self._items[index]
+
+    def __contains__(self, item):
+        """Check if the list contains an item (using a binary search)."""
+        key = natural_sort_key(item)
+        pos = bisect.bisect_left(self._keys, key)
+        while pos < len(self._keys) and self._keys[pos] == key:
+            if self._items[pos] == item:
+                return True
+            pos += 1
+        return False
 
-    return sorted(data, key=alphanum_key)
+    def __repr__(self):
+        """Return a string representation of the object."""
+        return "NaturalSortedList(%r)" % self._items
+
+    def add(self, item):
+        """Insert an item at its sorted position.
+
+        Parameters
+        ----------
+        item : str
+            The item to be inserted.
+        """
+        key = natural_sort_key(item)
+        pos = bisect.bisect_right(self._keys, key)
+        self._keys.insert(pos, key)
+        self._items.insert(pos, item)
+
+    def update(self, items):
+        """Insert multiple items at their sorted positions.
+
+        Parameters
+        ----------
+        items : iterable(str)
+            The items to be inserted.
+        """
+        for item in items:
+            self.add(item)
 
 
 def pad_number(index, pad_length=2):
@@ -1,6 +1,9 @@
 """Tests for `imcflibs.iotools`."""
 # -*- coding: utf-8 -*-
 
+import bz2
+import gzip
+import os
 import pytest
 import zipfile
 
@@ -8,8 +11,15 @@ from os.path import join
 
 import io
 
+from imcflibs.iotools import close_archives
 from imcflibs.iotools import filehandle
+from imcflibs.iotools import iter_lines
+from imcflibs.iotools import MetadataCatalog
+from imcflibs.iotools import open_archive
 from imcflibs.iotools import readtxt
+from imcflibs.iotools import ResultCache
+from imcflibs.iotools import RESULT_MANIFEST
+from imcflibs.iotools import writetxt
 
 try:
     # Python 2: "file" is built-in
@@ -76,3 +86,141 @@ def test_readtxt(tmpdir):
 
     fromzip_flat = readtxt("content.txt", join(fh.dirname, "archive.zip"), flat=True)
     assert fromzip_flat == "".join(content)
+
+
+def test_iter_lines(tmpdir):
+    """Test streaming lines from plain, compressed and zipped files."""
+    content = ["line %s\n" % i for i in range(10)]
+    plain = tmpdir.join("content.txt")
+    plain.write("".join(content))
+    with gzip.open(str(tmpdir.join("content.txt.gz")), "wb") as fh:
+        fh.write("".join(content).encode("utf-8"))
+    with bz2.BZ2File(str(tmpdir.join("content.txt.bz2")), "w") as fh:
+        fh.write("".join(content).encode("utf-8"))
+    with zipfile.ZipFile(str(tmpdir.join("archive.zip")), "w") as zf:
+        zf.write(str(plain), arcname="content.txt")
+
+    assert list(iter_lines(str(plain))) == content
+    assert list(iter_lines("content.txt.gz", str(tmpdir))) == content
+    assert list(iter_lines("content.txt.bz2", str(tmpdir))) == content
+    assert list(iter_lines("content.txt", str(tmpdir.join("archive.zip")))) == content
+    assert readtxt("content.txt.gz", str(tmpdir), flat=True) == "".join(content)
+
+    chunks = list(iter_lines(str(plain), chunk_size=4))
+    assert [len(x) for x in chunks] == [4, 4, 2]
+    assert sum(chunks, []) == content
+
+
+def test_open_archive(tmpdir):
+    """Test re-using pooled archive handles and re-opening modified archives."""
+    archive = str(tmpdir.join("archive.zip"))
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("first.txt", "first\n")
+        zf.writestr("second.txt", "second\n")
+
+    handle = open_archive(archive)
+    assert readtxt("first.txt", archive) == ["first\n"]
+    assert readtxt("second.txt", archive) == ["second\n"]
+    assert open_archive(archive) is handle
+
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("first.txt", "modified\n")
+    os.utime(archive, (1000000000, 1000000000))
+    assert readtxt("first.txt", archive) == ["modified\n"]
+    assert open_archive(archive) is not handle
+
+    close_archives()
+    assert open_archive(archive) is not handle
+    close_archives(archive)
+
+
+def test_writetxt(tmpdir):
+    """Test writing chunks from a generator to a file name and a handle."""
+    fname = str(tmpdir.join("chunks.txt"))
+    assert writetxt(("line %s\n" % i for i in range(3)), fname) == 21
+    assert readtxt(fname) == ["line 0\n", "line 1\n", "line 2\n"]
+
+    with open(fname, "a") as fh:
+        writetxt(["more\n"], fh, mode="a")
+        assert not fh.closed
+    assert readtxt(fname)[-1] == "more\n"
+
+
+def test_result_cache(tmpdir):
+    """Test tracking results and detecting changed inputs and parameters."""
+    in_file = tmpdir.join("input.txt")
+    in_file.write("data")
+    out_dir = tmpdir.mkdir("results")
+    out_file = out_dir.join("result.txt")
+    inputs = [str(in_file), None]
+    params = {"sigma": 2.0}
+
+    cache = ResultCache(str(out_dir))
+    assert not cache.is_current(str(out_file), inputs, params)
+    out_file.write("result")
+    cache.record(str(out_file), inputs, params)
+    assert cache.is_current(str(out_file), inputs, params)
+    assert not cache.is_current(str(out_file), inputs, {"sigma": 3.0})
+
+    # the manifest is persisted in the output folder:
+    cache = ResultCache(str(out_dir))
+    assert cache.is_current(str(out_file), inputs, params)
+
+    # unless saving is deferred:
+    other_file = out_dir.join("other.txt")
+    other_file.write("result")
+    cache.record(str(other_file), inputs, params, save=False)
+    assert not ResultCache(str(out_dir)).is_current(str(other_file), inputs, params)
+    cache.save()
+    assert ResultCache(str(out_dir)).is_current(str(other_file), inputs, params)
+
+    in_file.write("modified data")
+    assert not cache.is_current(str(out_file), inputs, params)
+
+    in_file.remove()
+    assert not cache.is_current(str(out_file), inputs, params)
+
+
+def test_result_cache_invalid_manifest(tmpdir):
+    """Test a truncated manifest being ignored and replaced when saving."""
+    in_file = tmpdir.join("input.txt")
+    in_file.write("data")
+    out_file = tmpdir.join("result.txt")
+    out_file.write("result")
+    tmpdir.join(RESULT_MANIFEST).write('{"result.txt": {"inp')
+
+    cache = ResultCache(str(tmpdir))
+    assert not cache.is_current(str(out_file), [str(in_file)])
+    cache.record(str(out_file), [str(in_file)])
+    assert ResultCache(str(tmpdir)).is_current(str(out_file), [str(in_file)])
+    # no temporary files are left behind:
+    assert sorted(x.basename for x in tmpdir.listdir()) == sorted(
+        ["input.txt", "result.txt", RESULT_MANIFEST]
+    )
+
+
+def test_metadata_catalog(tmpdir):
+    """Test storing metadata and ignoring it once the file has changed."""
+    image = tmpdir.join("image.czi")
+    image.write("pixels")
+    catalog = MetadataCatalog(str(tmpdir))
+    assert catalog.get(str(image), "image") is None
+
+    catalog.set(str(image), "image", {"unit": "um", "size": [512, 512]})
+    assert not catalog.modified
+    catalog.set(str(image), "stage", {"x": 1.5}, save=False)
+    assert catalog.modified
+    catalog.save()
+    assert not catalog.modified
+    assert catalog.get(str(image), "image") == {"unit": "um", "size": [512, 512]}
+
+    # the catalog is persisted in the directory itself:
+    catalog = MetadataCatalog(str(tmpdir))
+    assert catalog.get(str(image), "stage") == {"x": 1.5}
+    assert catalog.get(str(image), "other") is None
+
+    image.write("modified pixels")
+    assert catalog.get(str(image), "image") is None
+    catalog.set(str(image), "image", {"unit": "nm"})
+    assert catalog.get(str(image), "image") == {"unit": "nm"}
+    assert catalog.get(str(image), "stage") is None
@@ -0,0 +1,52 @@
+"""Tests for the lazy submodule loading of `imcflibs`."""
+
+# -*- coding: utf-8 -*-
+
+import subprocess
+import sys
+
+import pytest
+
+import imcflibs
+
+
+def test_lazy_submodules():
+    """Test submodules are only imported once being accessed."""
+    code = (
+        "import sys, imcflibs; "
+        "assert 'imcflibs.strtools' not in sys.modules; "
+        "assert imcflibs.strtools.flatten(['a', 'b']) == 'ab'; "
+        "assert 'imcflibs.strtools' in sys.modules; "
+        "assert 'imcflibs.pathtools' not in sys.modules"
+    )
+    subprocess.check_call([sys.executable, "-c", code])
+
+
+def test_eager_submodules_jython(tmpdir):
+    """Test submodules being imported right away when running in Jython."""
+    package = tmpdir.mkdir("lazypkg")
+    package.join("__init__.py").write(
+        "from imcflibs._lazy import lazy_submodules\n"
+        "lazy_submodules(__name__, ['first', 'second'], eager=['first'])\n"
+    )
+    package.join("first.py").write("")
+    package.join("second.py").write("")
+    code = (
+        "import sys, types, imcflibs._lazy; "
+        "sys.path.insert(0, %r); "
+        "sys.platform = 'java1.8.0_172'; "
+        "import lazypkg; "
+        "assert type(lazypkg) is types.ModuleType; "
+        "assert sys.modules['lazypkg'] is lazypkg; "
+        "assert 'lazypkg.first' in sys.modules; "
+        "assert 'lazypkg.second' not in sys.modules"
+    ) % str(tmpdir)
+    subprocess.check_call([sys.executable, "-c", code])
+
+
+def test_lazy_module_attributes():
+    """Test attribute access and listing on the lazy package module."""
+    assert imcflibs.pathtools is sys.modules["imcflibs.pathtools"]
+    assert "iotools" in dir(imcflibs)
+    with pytest.raises(AttributeError):
+        imcflibs.nonexisting  # noqa: B018
@@ -0,0 +1,66 @@
+"""Tests for `imcflibs.log`."""
+
+# -*- coding: utf-8 -*-
+
+import logging
+
+from imcflibs import log
+
+
+def test_queue_logging(tmpdir):
+    """Test logging to a file through the background queue."""
+    fname = str(tmpdir.join("queued.log"))
+    level = log.LOG.level
+    log.LOG.setLevel(logging.DEBUG)
+    try:
+        queue_handler = log.enable_queue_logging(batch_size=10)
+        assert log.enable_queue_logging() is queue_handler
+        file_handler = log.enable_file_logging(fname)
+        for i in range(25):
+            log.LOG.debug("record %s", i)
+        log.LOG.error("final record")
+        log.disable_queue_logging()
+
+        # the file has to be flushed after every record again:
+        log.LOG.info("synchronous record")
+        with open(fname) as logfile:
+            lines = logfile.read().splitlines()
+    finally:
+        log.disable_queue_logging()
+        log.LOG.removeHandler(file_handler)
+        file_handler.close()
+        log.LOG.setLevel(level)
+
+    expected = ["record %s" % i for i in range(25)]
+    assert lines == expected + ["final record", "synchronous record"]
+
+
+def test_queue_logging_existing_file_handler(tmpdir):
+    """Test a file handler added before enabling queue logging being batched."""
+    file_handler = log.enable_file_logging(str(tmpdir.join("early.log")))
+    try:
+        assert not file_handler.batched
+        log.enable_queue_logging()
+        assert file_handler not in log.LOG.handlers
+        assert file_handler.batched
+        log.disable_queue_logging()
+        assert file_handler in log.LOG.handlers
+        assert not file_handler.batched
+    finally:
+        log.disable_queue_logging()
+        log.LOG.removeHandler(file_handler)
+        file_handler.close()
+
+
+def test_queue_logging_drops_debug():
+    """Test DEBUG records are dropped (and others kept) if the queue is full."""
+    records = []
+    queue = log.queue.Queue(2)
+    handler = log._QueueHandler(queue)
+    for i in range(4):
+        record = logging.LogRecord("x", logging.DEBUG, "", 0, "%s", (i,), None)
+        handler.emit(record)
+    assert handler.dropped == 2
+    while not queue.empty():
+        records.append(queue.get().msg)
+    assert records == ["0", "1"]
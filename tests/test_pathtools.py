@@ -1,10 +1,31 @@
 """Tests for `imcflibs.pathtools`."""
 # -*- coding: utf-8 -*-
 
+import copy
+import json
+import os
+import pickle
+import time
+
+import pytest
+
+from imcflibs import pathtools
+from imcflibs.pathtools import DirectoryIndex
+from imcflibs.pathtools import file_identity
+from imcflibs.pathtools import find_dirs_containing_filetype
+from imcflibs.pathtools import folder_size
+from imcflibs.pathtools import iter_dirs_containing_filetype
+from imcflibs.pathtools import iter_file_sizes
+from imcflibs.pathtools import listdir_matching
+from imcflibs.pathtools import listdir_matching_multi
+from imcflibs.pathtools import watch_matching
 from imcflibs.pathtools import parse_path
+from imcflibs.pathtools import parse_paths
+from imcflibs.pathtools import ParsedPath
 from imcflibs.pathtools import jython_fiji_exists
 from imcflibs.pathtools import image_basename
 from imcflibs.pathtools import gen_name_from_orig
+from imcflibs.pathtools import gen_names_from_orig
 from imcflibs.pathtools import derive_out_dir
 
 
@@ -32,6 +53,32 @@ def test_parse_path():
     assert path_to_dir["ext"] == ""
 
 
+def test_parse_path_result():
+    """Test the `ParsedPath` dict returned by `parse_path()`."""
+    parsed = parse_path("/tmp/foo/image.ome.tiff")
+    assert isinstance(parsed, ParsedPath)
+    assert isinstance(parsed, dict)
+    assert parsed.basename == parsed["basename"] == "image"
+    assert parsed.ext == ".ome.tiff"
+    assert parsed.get("nonexisting", "default") == "default"
+    assert parsed.to_dict() == parsed
+    assert parsed != parse_path("/tmp/foo/image.tif")
+    assert copy.copy(parsed) == parsed
+    assert pickle.loads(pickle.dumps(parsed)) == parsed
+    assert json.loads(json.dumps(parsed)) == parsed
+    assert "%s" % parsed == str(parsed.to_dict())
+
+    with pytest.raises(KeyError):
+        parsed["nonexisting"]  # pylint: disable-msg=pointless-statement
+
+    # every call returns a new object that can be modified (cached or not):
+    again = parse_path("/tmp/foo/image.ome.tiff")
+    assert again == parsed
+    assert again is not parsed
+    again["ext"] = ".png"
+    assert parse_path("/tmp/foo/image.ome.tiff")["ext"] == ".ome.tiff"
+
+
 def test_parse_path_with_prefix():
     """Test parse_path with a prefix parameter."""
     exp_full = "/FOO/BAR/tmp/foo/file.suffix"
@@ -91,6 +138,51 @@ def test_jython_fiji_exists(tmpdir):
     assert jython_fiji_exists(str(tmpdir)) == True
 
 
+def test_listdir_matching(tmpdir):
+    """Test matching file names by suffix and by regular expression."""
+    for name in ["img-10.czi", "img-2.CZI", "img-1.ome.tif", "notes.txt"]:
+        tmpdir.join(name).write("")
+    path = str(tmpdir)
+
+    assert listdir_matching(path, ".czi", sort=True) == ["img-2.CZI", "img-10.czi"]
+    assert listdir_matching(path, ".ome.tif", fullpath=True) == [
+        os.path.join(path, "img-1.ome.tif")
+    ]
+    assert listdir_matching(path, r"img-\d\.", regex=True, sort=True) == [
+        "img-1.ome.tif",
+        "img-2.CZI",
+    ]
+
+    matches = listdir_matching_multi(
+        path, suffixes=[".czi", ".tif", ".nd2"], regexes=["notes"], sort=True
+    )
+    assert list(matches.keys()) == [".czi", ".tif", ".nd2", "notes"]
+    assert matches[".czi"] == ["img-2.CZI", "img-10.czi"]
+    assert matches[".tif"] == ["img-1.ome.tif"]
+    assert matches[".nd2"] == []
+    assert matches["notes"] == ["notes.txt"]
+
+    with pytest.raises(ValueError):
+        listdir_matching_multi(path, suffixes=[".tif"], regexes=[".tif"])
+
+
+def test_watch_matching(tmpdir):
+    """Test watching a directory for completed files."""
+    tmpdir.join("tile-2.czi").write("x")
+    tmpdir.join("tile-1.czi").write("x")
+    tmpdir.join("notes.txt").write("x")
+    seen = set([str(tmpdir.join("tile-1.czi"))])
+
+    watcher = watch_matching(
+        str(tmpdir), ".czi", interval=0.01, settle=1, idle_timeout=0.1, seen=seen
+    )
+    assert next(watcher) == str(tmpdir.join("tile-2.czi"))
+    # a file arriving while the consumer is busy must be picked up as well:
+    tmpdir.join("tile-3.czi").write("x")
+    assert list(watcher) == [str(tmpdir.join("tile-3.czi"))]
+    assert len(seen) == 3
+
+
 def test_image_basename():
     """Test basename extraction for various image file names."""
     assert image_basename("/path/to/image_file_01.png") == "image_file_01"
@@ -108,9 +200,260 @@ def test_gen_name_from_orig():
     assert generated == "/outpath/foobar-avg.h5"
 
 
+def test_parse_paths():
+    """Test the bulk variant of `parse_path()` against the single-path one."""
+    paths = [
+        "/tmp/foo/file.ext",
+        "/tmp/foo/",
+        r"C:\Temp\new\file.ext",
+        "/path/to/some/nice.OME.tIf",
+        "relative/stack.ome.tiff",
+    ]
+    columns = parse_paths(paths, prefix="/prefix")
+    for i, path in enumerate(paths):
+        parsed = parse_path(path, prefix="/prefix")
+        for key in parsed.keys():
+            assert columns[key][i] == parsed[key]
+
+
+def test_gen_names_from_orig():
+    """Test the bulk variant of `gen_name_from_orig()`."""
+    inpaths = ["/inpath/to/foobar.tif", "/inpath/stack.OME.tiff", "raw.czi"]
+    generated = gen_names_from_orig("/outpath", inpaths, "-avg", ".h5")
+    assert generated == [
+        gen_name_from_orig("/outpath", inpath, "-avg", ".h5") for inpath in inpaths
+    ]
+    assert generated[1] == "/outpath/stack-avg.h5"
+
+
 def test_derive_out_dir():
     """Test derive_out_dir() using various parameter combinations."""
     assert derive_out_dir("/foo", "-") == "/foo"
     assert derive_out_dir("/foo", "none") == "/foo"
     assert derive_out_dir("/foo", "NONE") == "/foo"
     assert derive_out_dir("/foo", "/bar") == "/bar"
+
+
+def test_directory_index(tmpdir, monkeypatch):
+    """Test answering queries from a persisted `DirectoryIndex`."""
+    data = tmpdir.mkdir("data")
+    data.join("foo.tif").write("")
+    data.join("bar.czi").write("")
+    data.mkdir("sub").join("baz.czi").write("")
+    data.mkdir("empty")
+    # make sure the directories are not considered being modified "just now":
+    for path in [data, data.join("sub"), data.join("empty")]:
+        os.utime(str(path), (1000000000, 1000000000))
+
+    index_file = str(tmpdir.join("index.json"))
+    index = DirectoryIndex(index_file)
+    source = str(data)
+    assert listdir_matching(source, ".tif", index=index) == ["foo.tif"]
+    found = find_dirs_containing_filetype(source, ".czi", index=index)
+    assert sorted(found) == [source + "/", str(data.join("sub")) + "/"]
+    index.save()
+
+    # a re-loaded index must not list unchanged directories at all:
+    reloaded = DirectoryIndex(index_file)
+    assert len(reloaded) == 3
+
+    def no_scandir(path):
+        raise AssertionError("unchanged directory listed again: %s" % path)
+
+    with monkeypatch.context() as patched:
+        patched.setattr(pathtools, "_scandir", no_scandir)
+        assert listdir_matching(source, ".tif", index=reloaded) == ["foo.tif"]
+        assert find_dirs_containing_filetype(source, ".czi", index=reloaded) == found
+
+    # modifying a directory must trigger a re-scan:
+    data.join("sub").join("new.tif").write("")
+    subdir = str(data.join("sub"))
+    assert listdir_matching(subdir, ".tif", index=reloaded) == ["new.tif"]
+
+
+def test_directory_index_invalid_file(tmpdir):
+    """Test an invalid index file being ignored and replaced when saving."""
+    index_file = tmpdir.join("index.json")
+    index_file.write('{"version": 1, "entr')
+    data = tmpdir.mkdir("data")
+    data.join("foo.tif").write("")
+
+    index = DirectoryIndex(str(index_file))
+    assert len(index) == 0
+    assert index.listdir(str(data)) == ["foo.tif"]
+    index.save()
+    assert len(DirectoryIndex(str(index_file))) == 1
+    assert sorted(x.basename for x in tmpdir.listdir()) == ["data", "index.json"]
+
+
+def test_iter_dirs_containing_filetype(tmpdir):
+    """Test the streaming directory search including its limits."""
+    tmpdir.join("a.czi").write("")
+    level1 = tmpdir.mkdir("level1")
+    level1.join("b.czi").write("")
+    level1.mkdir("level2").join("c.czi").write("")
+    source = str(tmpdir)
+
+    found = list(iter_dirs_containing_filetype(source, ".czi"))
+    assert found == [
+        source + "/",
+        str(level1) + "/",
+        str(level1.join("level2")) + "/",
+    ]
+    assert find_dirs_containing_filetype(source, ".czi") == found
+    assert list(iter_dirs_containing_filetype(source, ".czi", max_depth=1)) == found[:2]
+    assert list(iter_dirs_containing_filetype(source, ".czi", limit=1)) == found[:1]
+
+
+def test_folder_size(tmpdir):
+    """Test `folder_size()` and `iter_file_sizes()`, skipping symlinks."""
+    tmpdir.join("ten").write("x" * 10)
+    tmpdir.mkdir("sub").join("five").write("x" * 5)
+    source = str(tmpdir)
+    if hasattr(os, "symlink"):
+        os.symlink(str(tmpdir.join("ten")), str(tmpdir.join("link")))
+
+    assert folder_size(source) == 15
+    assert dict(iter_file_sizes(source, max_depth=0)) == {
+        str(tmpdir.join("ten")): 10
+    }
+    assert len(list(iter_file_sizes(source, limit=1))) == 1
+
+
+def test_folder_size_without_scandir(tmpdir, monkeypatch):
+    """Test the `os.listdir()` fallback used on Python 2.7 / Jython."""
+    tmpdir.join("ten").write("x" * 10)
+    tmpdir.mkdir("sub").join("five").write("x" * 5)
+    monkeypatch.delattr(os, "scandir", raising=False)
+    assert folder_size(str(tmpdir)) == 15
+
+
+def test_folder_size_threaded(tmpdir):
+    """Test `folder_size()` using multiple threads and a directory index."""
+    expected = 0
+    for i in range(4):
+        subdir = tmpdir.mkdir("sub%s" % i)
+        for j in range(3):
+            subdir.mkdir("nested%s" % j).join("file").write("x" * (i + j))
+            expected += i + j
+    tmpdir.join("top").write("x" * 7)
+    expected += 7
+    source = str(tmpdir)
+
+    assert folder_size(source, threads=4) == expected
+    index = DirectoryIndex()
+    assert folder_size(source, threads=4, index=index) == expected
+    assert folder_size(source, index=index) == expected
+
+
+def test_folder_size_index_scans(tmpdir, monkeypatch):
+    """Test a cold `DirectoryIndex` listing every directory only once."""
+    tmpdir.join("ten").write("x" * 10)
+    tmpdir.mkdir("sub").join("five").write("x" * 5)
+    for path in [tmpdir, tmpdir.join("sub")]:
+        os.utime(str(path), (1000000000, 1000000000))
+    source = str(tmpdir)
+    listed = []
+    scandir = pathtools._scandir
+
+    def counting_scandir(path):
+        listed.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(pathtools, "_scandir", counting_scandir)
+    index = DirectoryIndex()
+    assert folder_size(source, index=index) == 15
+    assert sorted(listed) == [source, str(tmpdir.join("sub"))]
+
+    # entries are keyed by the absolute path, no matter how it is given:
+    monkeypatch.chdir(source)
+    assert index.listdir(".") == index.listdir(source)
+    assert index.dir_size("sub") == 5
+    assert len(index) == 2
+    assert len(listed) == 2
+
+    # vanished directories are skipped, same as without an index:
+    assert pathtools._scan_size(str(tmpdir.join("gone")), index) == (0, [])
+
+def test_file_identity(tmpdir):
+    """Test the file fingerprint with and without a partial hash."""
+    fname = tmpdir.join("file.txt")
+    fname.write("abcd")
+    identity = file_identity(fname)
+    assert sorted(identity.keys()) == ["mtime", "size"]
+    assert identity["size"] == 4
+
+    hashed = file_identity(fname, hash_bytes=2)
+    assert hashed["md5"] == "187ef4436122d1cc2f40dc2b92f0eba0"  # md5("ab")
+    fname.write("abxx")
+    assert file_identity(fname, hash_bytes=2)["md5"] == hashed["md5"]
+
+
+def test_stat_cache(tmpdir, monkeypatch):
+    """Test caching, updating and invalidating results of `exists()`."""
+    calls = []
+
+    def counting_exists(path):
+        calls.append(path)
+        return os.path.exists(path)
+
+    monkeypatch.setattr(pathtools, "_exists", counting_exists)
+    newdir = str(tmpdir.join("new"))
+    assert not pathtools.exists(newdir)
+    assert not pathtools.exists(newdir)
+    assert len(calls) == 2
+
+    pathtools.enable_stat_cache(ttl=60)
+    try:
+        assert not pathtools.exists(newdir)
+        assert not pathtools.exists(newdir)
+        assert len(calls) == 3
+
+        pathtools.create_directory(newdir)
+        assert pathtools.exists(newdir)
+        assert len(calls) == 3
+
+        os.rmdir(newdir)
+        assert pathtools.exists(newdir)  # stale until invalidated
+        pathtools.invalidate_stat_cache(str(tmpdir))
+        assert not pathtools.exists(newdir)
+        assert len(calls) == 4
+    finally:
+        pathtools.disable_stat_cache()
+
+
+def test_stat_cache_bounded(tmpdir, monkeypatch):
+    """Test the cache for `exists()` dropping expired and surplus entries."""
+    monkeypatch.setattr(pathtools, "_STAT_CACHE_SIZE", 3)
+    pathtools.enable_stat_cache(ttl=60)
+    try:
+        for i in range(5):
+            pathtools.exists(str(tmpdir.join("file%s" % i)))
+        assert list(pathtools._STAT_CACHE) == [
+            str(tmpdir.join("file%s" % i)) for i in range(2, 5)
+        ]
+
+        pathtools.enable_stat_cache(ttl=0.01)
+        time.sleep(0.02)
+        pathtools.exists(str(tmpdir))
+        assert list(pathtools._STAT_CACHE) == [str(tmpdir)]
+    finally:
+        pathtools.disable_stat_cache()
+
+
+def test_stat_cache_create_parents(tmpdir):
+    """Test `create_directory()` marking created parents as present."""
+    outdir = str(tmpdir.join("out"))
+    pathtools.enable_stat_cache(ttl=60)
+    try:
+        assert not pathtools.exists(outdir)
+        pathtools.create_directory(os.path.join(outdir, "a", "b"))
+        assert pathtools.exists(outdir)
+        pathtools.create_directory(outdir)
+
+        # a stale negative result must not make the call fail:
+        pathtools.update_stat_cache(outdir, present=False)
+        pathtools.create_directory(outdir)
+        assert pathtools.exists(outdir)
+    finally:
+        pathtools.disable_stat_cache()
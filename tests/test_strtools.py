@@ -7,6 +7,9 @@ import os
 from imcflibs.strtools import _is_string_like
 from imcflibs.strtools import filename
 from imcflibs.strtools import flatten
+from imcflibs.strtools import natural_sort_key
+from imcflibs.strtools import NaturalSortedList
+from imcflibs.strtools import sort_alphanumerically
 from imcflibs.strtools import strip_prefix
 
 
@@ -33,7 +36,32 @@ def test_flatten():
     assert flatten(("foo", "bar")) == "foobar"
 
 
+def test_flatten_generator():
+    """Test `flatten()` using a generator."""
+    assert flatten(str(x) for x in range(5)) == "01234"
+
+
 def test_strip_prefix():
     """Test `strip_prefix()`."""
     assert strip_prefix("foobar", "foo") == "bar"
     assert strip_prefix("foobar", "bar") == "foobar"
+
+
+def test_sort_alphanumerically():
+    """Test natural sorting using `sort_alphanumerically()`."""
+    data = ["foo-10", "Foo-2", "foo-1", "bar"]
+    assert sort_alphanumerically(data) == ["bar", "foo-1", "Foo-2", "foo-10"]
+    assert natural_sort_key("Tile-12_z3.tif") == ("tile-", 12, "_z", 3, ".tif")
+
+
+def test_natural_sorted_list():
+    """Test inserting items into a `NaturalSortedList`."""
+    files = NaturalSortedList(["tile-10.tif", "tile-1.tif"])
+    files.add("tile-2.tif")
+    files.update(["tile-100.tif", "tile-0.tif"])
+    expected = ["tile-0.tif", "tile-1.tif", "tile-2.tif", "tile-10.tif", "tile-100.tif"]
+    assert list(files) == expected
+    assert len(files) == 5
+    assert files[2] == "tile-2.tif"
+    assert "tile-10.tif" in files
+    assert "tile-3.tif" not in files
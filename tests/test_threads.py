@@ -0,0 +1,37 @@
+"""Tests for the minimal thread pool of `imcflibs`."""
+
+# -*- coding: utf-8 -*-
+
+import threading
+
+import pytest
+
+from imcflibs._threads import run_threaded
+
+
+def test_run_threaded():
+    """Test the results are in order and the work is spread across threads."""
+    names = set()
+
+    def square(value):
+        names.add(threading.current_thread().name)
+        return value * value
+
+    assert run_threaded(square, range(100), 4) == [x * x for x in range(100)]
+    assert run_threaded(square, [], 4) == []
+
+    names.clear()
+    assert run_threaded(square, range(10), 1) == [x * x for x in range(10)]
+    assert names == set([threading.current_thread().name])
+
+
+def test_run_threaded_error():
+    """Test an exception raised by a worker is re-raised in the caller."""
+
+    def check(value):
+        if value == 5:
+            raise ValueError("invalid value: %s" % value)
+        return value
+
+    with pytest.raises(ValueError):
+        run_threaded(check, range(20), 4)
@@ -0,0 +1,110 @@
+"""Tests for `imcflibs.imagej.timing`."""
+
+# -*- coding: utf-8 -*-
+
+import csv
+import json
+
+import pytest
+
+from imcflibs.imagej import timing
+
+
+@pytest.fixture(autouse=True)
+def reset_stats():
+    """Make sure every test starts (and leaves) without any statistics."""
+    timing.reset_stage_stats()
+    yield
+    timing.reset_stage_stats()
+
+
+@timing.timed
+def _double(value):
+    """Return the doubled value, used as a timed function."""
+    return value * 2
+
+
+def test_timed_stage():
+    """Test calls of a stage being accumulated, including failing ones."""
+    with timing.timed_stage("loading"):
+        pass
+    with pytest.raises(ValueError):
+        with timing.timed_stage("loading"):
+            raise ValueError("failing call")
+
+    stats = timing.get_stage_stats()
+    assert len(stats) == 1
+    row = stats[0]
+    assert set(row) == set(timing.STAGE_FIELDS)
+    assert row["stage"] == "loading"
+    assert row["calls"] == 2
+    assert row["min_time"] <= row["mean_time"] <= row["max_time"]
+    assert row["total_time"] == pytest.approx(2 * row["mean_time"])
+
+
+def test_timed_decorator():
+    """Test decorated functions being recorded under their module name."""
+    assert _double(2) == 4
+    assert _double.__name__ == "_double"
+    with timing.timed_stage("other"):
+        _double(3)
+
+    stats = timing.get_stage_stats()
+    assert [x["stage"] for x in stats] == ["test_timing._double", "other"]
+    assert stats[0]["calls"] == 2
+
+
+def test_record_memory():
+    """Test the minimum free memory being tracked across calls."""
+    timing._record("stage", 1.0, 300, 100)
+    timing._record("stage", 3.0, 200, None)
+    timing._record("stage", 2.0, None, None)
+
+    row = timing.get_stage_stats()[0]
+    assert row["calls"] == 3
+    assert row["total_time"] == 6.0
+    assert row["mean_time"] == 2.0
+    assert (row["min_time"], row["max_time"]) == (1.0, 3.0)
+    assert (row["free_mem_before"], row["free_mem_after"]) == (None, None)
+    assert row["min_free_mem"] == 100
+
+
+def test_reset_stage_stats():
+    """Test discarding the statistics."""
+    with timing.timed_stage("stage"):
+        pass
+    timing.reset_stage_stats()
+    assert timing.get_stage_stats() == []
+
+
+def test_format_stage_stats():
+    """Test the statistics table having a header and one line per stage."""
+    timing._record("first", 1.5, None, None)
+    timing._record("second", 0.25, None, None)
+
+    lines = timing.format_stage_stats().splitlines()
+    assert len(lines) == 3
+    assert lines[0].split() == ["stage", "calls", "total", "mean", "max"]
+    assert lines[1].split() == ["first", "1", "1.50s", "1.500s", "1.500s"]
+    assert lines[2].split() == ["second", "1", "0.25s", "0.250s", "0.250s"]
+
+
+def test_dump_stage_stats(tmpdir):
+    """Test saving the statistics as CSV and JSON."""
+    timing._record("stage", 1.5, 200, 100)
+
+    csv_file = str(tmpdir.join("timing.csv"))
+    timing.dump_stage_stats(csv_file)
+    with open(csv_file) as fh:
+        rows = list(csv.DictReader(fh))
+    assert len(rows) == 1
+    assert list(rows[0]) == timing.STAGE_FIELDS
+    assert rows[0]["stage"] == "stage"
+    assert float(rows[0]["total_time"]) == 1.5
+
+    json_file = str(tmpdir.join("timing.JSON"))
+    timing.dump_stage_stats(json_file)
+    with open(json_file) as fh:
+        rows = json.load(fh)
+    assert list(rows[0]) == timing.STAGE_FIELDS
+    assert rows[0]["min_free_mem"] == 100